@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import chatbot
+
+ORIGINAL_VARIANTS = dict(chatbot.question_variants)
+CHATBOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chatbot.py")
+
+# Budget for `chatbot.py --question` on top of a bare interpreter start
+STARTUP_BUDGET_MS = 150
+
+DEFAULT_SIZES = "100,1000,10000,100000"
+DEFAULT_TOLERANCE = 0.25
+LOOKUP_SAMPLES = 1000
+MUTATION_SAMPLES = 200
+
+TOPICS = ["python", "chatbot", "weather", "germany", "ostfalia", "mensa", "library", "exam",
+          "lecture", "semester", "campus", "internship", "moodle", "printing", "enrolment"]
+SUBJECTS = ["rules", "hours", "location", "price", "contact", "deadline", "office", "history"]
+SHARED_ANSWERS = ["Please ask the International Office.", "Check the Ostfalia web portal.",
+                  "It depends on the semester.", "See the notice board in building A."]
+
+
+def time_command(cmd, cwd, runs):
+    """Return the median wall time of cmd in milliseconds."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def check_startup(runs, budget_ms):
+    """Time a one-shot --question and fail if it costs more than budget_ms over `python -c pass`."""
+    with tempfile.TemporaryDirectory() as workdir:
+        baseline = time_command([sys.executable, "-c", "pass"], workdir, runs)
+        question = time_command([sys.executable, CHATBOT, "--question", "what is python?"], workdir, runs)
+
+    overhead = question - baseline
+    print(f"interpreter: {baseline:.1f} ms, --question: {question:.1f} ms, overhead: {overhead:.1f} ms (budget {budget_ms} ms)")
+    if overhead > budget_ms:
+        print("❌ Startup is over budget.")
+        return False
+    print("✅ Startup is within budget.")
+    return True
+
+
+def synthetic_question(i):
+    return f"what is the {SUBJECTS[i % len(SUBJECTS)]} of {TOPICS[i % len(TOPICS)]} {i}?"
+
+
+def write_knowledge_csv(path, size, seed=0):
+    """Write a chatbot_knowledge.csv-style file with size questions, multi-answer rows and variants."""
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Question", "Answer1", "Answer2", "Answer3", "Answer4", "Variations"])
+        for i in range(size):
+            answers = [f"Answer {i}.{n}" for n in range(rng.randint(1, 4))]
+            if rng.random() < 0.3:
+                answers[-1] = rng.choice(SHARED_ANSWERS)
+            answers += [""] * (4 - len(answers))
+            variations = ""
+            if rng.random() < 0.1:
+                subject, topic = SUBJECTS[i % len(SUBJECTS)], TOPICS[i % len(TOPICS)]
+                variations = f"whats the {subject} of {topic} {i};{topic} {i} {subject}?"
+            writer.writerow([synthetic_question(i)] + answers + [variations])
+
+
+def reset_chatbot():
+    """Point chatbot at an empty store in the current directory."""
+    chatbot.store.close()
+    chatbot.store = chatbot.JournalStore(chatbot.SNAPSHOT_FILE, chatbot.JOURNAL_FILE, legacy_path=chatbot.QUESTION_FILE)
+    chatbot.question_variants.clear()
+    chatbot.question_variants.update(ORIGINAL_VARIANTS)
+    chatbot.compiled_kb = None
+    # Lookups are timed uncached so results stay comparable; cached_lookup_us covers the cache
+    chatbot.answer_cache.size = 0
+    chatbot.load_questions()
+
+
+def per_op_us(fn, items):
+    """Return (mean, p95) microseconds of fn over items."""
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.fmean(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def bench_size(size, runs):
+    """Run every benchmark against a synthetic knowledge base of size questions."""
+    args = argparse.Namespace(log=False, fuzzy=False, fuzzy_threshold=chatbot.FUZZY_THRESHOLD, spellcheck=False)
+    results = {}
+    rng = random.Random(size)
+    quiet = io.StringIO()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            reset_chatbot()
+            write_knowledge_csv("knowledge.csv", size)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(quiet):
+                chatbot.import_questions_from_file("knowledge.csv", "CSV", args)
+            chatbot.store.close()
+            results["import_s"] = time.perf_counter() - start
+
+            picks = [rng.randrange(size) for _ in range(LOOKUP_SAMPLES)]
+            singles = [synthetic_question(i) for i in picks]
+            compounds = [f"hi, {synthetic_question(i)} and {synthetic_question(j)}"
+                         for i, j in zip(picks, reversed(picks))]
+            misses = [f"what is the colour of nothing {i}?" for i in picks]
+            results["lookup_us"], results["lookup_p95_us"] = per_op_us(lambda q: chatbot.answer_question(q, args), singles)
+            results["compound_lookup_us"], _ = per_op_us(lambda q: chatbot.answer_question(q, args), compounds)
+            results["miss_lookup_us"], _ = per_op_us(lambda q: chatbot.answer_question(q, args), misses)
+            chatbot.answer_cache.size = chatbot.ANSWER_CACHE_SIZE
+            results["cached_lookup_us"], _ = per_op_us(lambda q: chatbot.answer_question(q, args), singles + singles)
+            chatbot.answer_cache.size = 0
+            chatbot.answer_cache.clear()
+
+            new_questions = [f"benchmark question {i}" for i in range(MUTATION_SAMPLES)]
+            with contextlib.redirect_stdout(quiet):
+                results["add_us"], _ = per_op_us(lambda q: chatbot.add_question(q, "yes", args), new_questions)
+                results["remove_us"], _ = per_op_us(lambda q: chatbot.remove_question(q, args), new_questions)
+            chatbot.store.close()
+
+            start = time.perf_counter()
+            chatbot.load_questions()
+            results["load_s"] = time.perf_counter() - start
+
+            question = ["--question", synthetic_question(picks[0])]
+            results["cold_start_ms"] = time_command([sys.executable, CHATBOT] + question, workdir, runs)
+            chatbot.compile_knowledge_base(chatbot.KB_FILE)
+            results["cold_start_kb_ms"] = time_command([sys.executable, CHATBOT, "--kb", chatbot.KB_FILE] + question, workdir, runs)
+        finally:
+            chatbot.store.close()
+            os.chdir(cwd)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print every metric next to its baseline; returns how many slowed down by more than tolerance."""
+    regressions = 0
+    for size, metrics in results["results"].items():
+        old_metrics = baseline.get("results", {}).get(size, {})
+        for name, value in metrics.items():
+            old = old_metrics.get(name)
+            if not old:
+                continue
+            change = value / old - 1
+            flag = ""
+            if change > tolerance:
+                regressions += 1
+                flag = "  ❌ regression"
+            print(f"{size:>8} {name:<20} {old:12.3f} → {value:12.3f} ({change:+.0%}){flag}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chatbot benchmarks")
+    parser.add_argument("--sizes", type=str, default=DEFAULT_SIZES,
+                        help=f"Comma-separated knowledge base sizes (default: {DEFAULT_SIZES}; up to 1000000).")
+    parser.add_argument("--runs", type=int, default=10,
+                        help="Number of timed runs per process-startup measurement (default: 10).")
+    parser.add_argument("--output", type=str,
+                        help="Write results as JSON to this path.")
+    parser.add_argument("--compare", type=str, metavar="BASELINE",
+                        help="Compare against an earlier --output file and fail on regressions.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed slowdown before a metric counts as a regression (default: {DEFAULT_TOLERANCE}).")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help=f"Allowed --question startup overhead in ms (default: {STARTUP_BUDGET_MS}).")
+    parser.add_argument("--startup-only", action="store_true",
+                        help="Only run the startup budget check.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    ok = check_startup(args.runs, args.budget_ms)
+    if args.startup_only:
+        sys.exit(0 if ok else 1)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {},
+    }
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"⏳ Benchmarking {size} question(s)...")
+        metrics = bench_size(size, args.runs)
+        results["results"][str(size)] = metrics
+        for name, value in metrics.items():
+            print(f"   {name:<20} {value:12.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to '{args.output}'.")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            ok = False
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
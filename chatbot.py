@@ -5,17 +5,55 @@ import random
 import json
 import re
 import os
-import pandas as pd
-try:
-    from sense_hat import SenseHat
-    sense = SenseHat()
-    SENSE_HAT_AVAILABLE = True
-except ImportError:
-    SENSE_HAT_AVAILABLE = False
+import math
+import atexit
+import struct
+import hashlib
+import queue
+import itertools
+import bisect
+import heapq
+import contextlib
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+# numpy/scipy (fuzzy matching) and the Sense HAT are imported on first use,
+# so one-shot commands don't pay for them at startup.
+np = None
+sparse = None
+FUZZY_AVAILABLE = None
+
+def load_fuzzy_deps():
+    global np, sparse, FUZZY_AVAILABLE
+    if FUZZY_AVAILABLE is None:
+        try:
+            import numpy as np
+            from scipy import sparse
+            FUZZY_AVAILABLE = True
+        except ImportError:
+            FUZZY_AVAILABLE = False
+    return FUZZY_AVAILABLE
+
+sense = None
+SENSE_HAT_AVAILABLE = None
+
+def get_sense():
+    """Return the SenseHat, initialising it on first call; None without the hardware."""
+    global sense, SENSE_HAT_AVAILABLE
+    if SENSE_HAT_AVAILABLE is None:
+        try:
+            from sense_hat import SenseHat
+            sense = SenseHat()
+            SENSE_HAT_AVAILABLE = True
+        except ImportError:
+            SENSE_HAT_AVAILABLE = False
+    return sense
 
 
 def show_right():
-    if not SENSE_HAT_AVAILABLE:
+    sense = get_sense()
+    if sense is None:
         return
     G = (0, 255, 0)
     O = (0, 0, 0)
@@ -29,13 +67,12 @@ def show_right():
         O, O, O, O, O, O, O, O,
         O, O, O, O, O, O, O, O,
     ]
-    sense.set_pixels(check)
-    time.sleep(2)
-    sense.clear()
+    get_display().show_pixels(check, DISPLAY_FEEDBACK_SECONDS)
 
 def show_wrong():
-    if not SENSE_HAT_AVAILABLE:
-     return
+    sense = get_sense()
+    if sense is None:
+        return
     R = (255, 0, 0)
     O = (0, 0, 0)
     cross = [
@@ -48,52 +85,522 @@ def show_wrong():
         O, R, O, O, O, O, R, O,
         R, O, O, O, O, O, O, R,
     ]
-    sense.set_pixels(cross)
-    time.sleep(2)
-    sense.clear()
+    get_display().show_pixels(cross, DISPLAY_FEEDBACK_SECONDS)
 
 def show_score(score, total):
-     if not SENSE_HAT_AVAILABLE:
-      return
+     sense = get_sense()
+     if sense is None:
+         return
      message = f"Score: {score}/{total}"
-     sense.show_message(message, scroll_speed=0.08, text_colour=(0, 255, 255))
+     get_display().show_message(message, scroll_speed=0.08, text_colour=(0, 255, 255))
 
 def show_temperature():
-    if not SENSE_HAT_AVAILABLE:
-     return
-    temp = sense.get_temperature()
+    sense = get_sense()
+    if sense is None:
+        return
+    temp = get_sampler().latest()
     temp = round(temp, 1)
-    sense.show_message(f"{temp}C", scroll_speed=0.08, text_colour=(255, 165, 0))
+    get_display().show_message(f"{temp}C", scroll_speed=0.08, text_colour=(255, 165, 0))
 
 def show_temperature_static():
-    if not SENSE_HAT_AVAILABLE:
-     return
-    temp = sense.get_temperature()
+    sense = get_sense()
+    if sense is None:
+        return
+    temp = get_sampler().smoothed()
     temp = round(temp, 1)
     # Show as two digits or int part if you prefer
-    sense.show_message(f"{int(temp)}C", scroll_speed=0.05, text_colour=(255, 165, 0))
+    get_display().show_message(f"{int(temp)}C", scroll_speed=0.05, text_colour=(255, 165, 0))
 
 import threading  # make sure this is imported at the top with the others
 
-def scroll_temperature_forever(stop_event):
-    if not SENSE_HAT_AVAILABLE:
-     return
-    """Continuously scrolls temperature until stop_event is set."""
-    while not stop_event.is_set():
-        temp = sense.get_temperature()
-        temp = round(temp, 1)
-        sense.show_message(f"{temp}C", scroll_speed=0.08, text_colour=(255, 165, 0))
-        # Very short sleep to allow interruption
-        time.sleep(0.1)
-    sense.clear()
+# Temperature sampling
+TEMP_SAMPLE_INTERVAL = 1.0     # seconds between sensor reads
+TEMP_HISTORY_SIZE = 600        # readings kept in the ring buffer
+TEMP_SMOOTHING = 5             # readings averaged by smoothed()
+
+class TemperatureSampler:
+    """Reads the sensor on a fixed cadence into a fixed-size ring buffer.
+
+    Display code asks for latest()/smoothed() instead of touching the bus,
+    so a slow I2C read happens once per interval no matter how many
+    readers there are.
+    """
+
+    def __init__(self, device, interval=TEMP_SAMPLE_INTERVAL, size=TEMP_HISTORY_SIZE):
+        self.device = device
+        self.interval = interval
+        self.size = size
+        self.values = array('d', [0.0]) * size
+        self.times = array('d', [0.0]) * size
+        self.count = 0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="temperature-sampler", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        self.sample()
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        value = self.device.get_temperature()
+        with self.lock:
+            slot = self.count % self.size
+            self.values[slot] = value
+            self.times[slot] = time.time()
+            self.count += 1
+        return value
+
+    def latest(self):
+        with self.lock:
+            if self.count:
+                return self.values[(self.count - 1) % self.size]
+        return self.sample()
+
+    def smoothed(self, n=TEMP_SMOOTHING):
+        """Mean of the last n readings."""
+        readings = [value for _, value in self.history(n)]
+        if not readings:
+            return self.sample()
+        return sum(readings) / len(readings)
+
+    def history(self, n=None):
+        """Return up to n (timestamp, value) readings, oldest first."""
+        with self.lock:
+            available = min(self.count, self.size)
+            n = available if n is None else min(n, available)
+            start = self.count - n
+            return [(self.times[i % self.size], self.values[i % self.size]) for i in range(start, self.count)]
+
+temperature_sampler = None
+
+def get_sampler(interval=TEMP_SAMPLE_INTERVAL):
+    """Return the running temperature sampler, starting it on first use; None without a sensor."""
+    global temperature_sampler
+    if temperature_sampler is None:
+        device = get_sense()
+        if device is None:
+            return None
+        temperature_sampler = TemperatureSampler(device, interval).start()
+        atexit.register(temperature_sampler.stop)
+    return temperature_sampler
+
+def format_temperature_history(readings):
+    return [f"{time.strftime('%H:%M:%S', time.localtime(ts))}  {value:.1f}C" for ts, value in readings]
+
+def print_temperature_history(count, interval):
+    """Collect count readings at the sampling cadence and print them."""
+    sampler = get_sampler(interval)
+    if sampler is None:
+        print("❌ Error: No Sense HAT found (try --simulate-sense-hat).")
+        return
+    while sampler.count < count:
+        time.sleep(sampler.interval / 4)
+    print("\n--- Temperature History ---")
+    for line in format_temperature_history(sampler.history(count)):
+        print(line)
+    print(f"Latest: {sampler.latest():.1f}C, smoothed: {sampler.smoothed():.1f}C")
+
+# Display priorities: lower numbers are drawn first
+DISPLAY_STOP = 0
+DISPLAY_FEEDBACK = 1
+DISPLAY_MESSAGE = 2
+DISPLAY_FEEDBACK_SECONDS = 2
+TICKER_COLOUR = (255, 165, 0)
+
+class DisplayWorker:
+    """One long-lived thread that owns the LED matrix.
+
+    Commands wait on a priority queue, so trivia feedback jumps ahead of
+    scrolling messages. The temperature ticker only runs while the queue is
+    empty and scrolls one character at a time, so any new command or
+    stop_ticker() takes over within a character. Callers never block.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.ticker = threading.Event()
+        self.next_command = None
+        self.thread = threading.Thread(target=self._run, name="led-display", daemon=True)
+        self.thread.start()
+
+    def _post(self, priority, action, *payload):
+        self.queue.put((priority, next(self.order), action, payload))
+
+    def show_pixels(self, pixels, seconds, priority=DISPLAY_FEEDBACK):
+        self._post(priority, "pixels", pixels, seconds)
+
+    def show_message(self, text, scroll_speed=0.08, text_colour=(255, 255, 255), priority=DISPLAY_MESSAGE):
+        self._post(priority, "message", text, scroll_speed, text_colour)
+
+    def start_ticker(self):
+        self.ticker.set()
+        self._post(DISPLAY_MESSAGE, "wake")
+
+    def stop_ticker(self):
+        self.ticker.clear()
+
+    def stop(self):
+        self.ticker.clear()
+        self._post(DISPLAY_STOP, "stop")
+        self.thread.join()
+
+    def _next(self):
+        if self.next_command is not None:
+            command, self.next_command = self.next_command, None
+            return command
+        if self.ticker.is_set():
+            return self.queue.get_nowait()
+        return self.queue.get()
+
+    def _run(self):
+        while True:
+            try:
+                _, _, action, payload = self._next()
+            except queue.Empty:
+                self._tick()
+                continue
+            if action == "stop":
+                self.device.clear()
+                return
+            if action == "pixels":
+                pixels, seconds = payload
+                self.device.set_pixels(pixels)
+                self._hold(seconds)
+                self.device.clear()
+            elif action == "message":
+                text, scroll_speed, text_colour = payload
+                self.device.show_message(text, scroll_speed=scroll_speed, text_colour=text_colour)
+
+    def _hold(self, seconds):
+        """Keep the current image up for seconds, or until more feedback preempts it."""
+        deferred = []
+        deadline = time.monotonic() + seconds
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    command = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if command[0] <= DISPLAY_FEEDBACK:
+                    self.next_command = command
+                    break
+                deferred.append(command)
+        finally:
+            for command in deferred:
+                self.queue.put(command)
+
+    def _tick(self):
+        temp = round(get_sampler().latest(), 1)
+        for char in f"{temp}C":
+            if not self.ticker.is_set() or not self.queue.empty():
+                break
+            self.device.show_message(char, scroll_speed=0.08, text_colour=TICKER_COLOUR)
+        else:
+            # Very short pause between readings, still interruptible
+            try:
+                self.next_command = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+            return
+        self.device.clear()
+
+class NullDisplay:
+    """Stands in for DisplayWorker when there is no LED matrix."""
+
+    def show_pixels(self, pixels, seconds, priority=DISPLAY_FEEDBACK):
+        pass
+
+    def show_message(self, text, scroll_speed=0.08, text_colour=(255, 255, 255), priority=DISPLAY_MESSAGE):
+        pass
+
+    def start_ticker(self):
+        pass
+
+    def stop_ticker(self):
+        pass
+
+    def stop(self):
+        pass
+
+display_worker = None
+
+def get_display():
+    """Return the display worker, starting it on first use."""
+    global display_worker
+    if display_worker is None:
+        device = get_sense()
+        display_worker = NullDisplay() if device is None else DisplayWorker(device)
+        atexit.register(display_worker.stop)
+    return display_worker
+
+class SimulatedSenseHat:
+    """Off-device stand-in for SenseHat that records what would be drawn.
+
+    time_scale multiplies the time a real scroll would take (0 = instant).
+    """
+
+    def __init__(self, base_temperature=22.0, time_scale=1.0):
+        self.temperature = base_temperature
+        self.time_scale = time_scale
+        self.calls = []
+
+    def get_temperature(self):
+        self.temperature += random.uniform(-0.2, 0.2)
+        return self.temperature
+
+    def set_pixels(self, pixels):
+        self.calls.append(("set_pixels", list(pixels)))
+
+    def clear(self):
+        self.calls.append(("clear",))
+
+    def show_message(self, text, scroll_speed=0.1, text_colour=(255, 255, 255)):
+        self.calls.append(("show_message", text, text_colour))
+        # The real matrix scrolls each 8-pixel-wide character across the display
+        time.sleep(len(text) * 8 * scroll_speed * self.time_scale)
+
+def use_simulated_sense_hat(device=None):
+    """Route all LED output to a SimulatedSenseHat (or the given fake device)."""
+    global sense, SENSE_HAT_AVAILABLE
+    sense = device or SimulatedSenseHat()
+    SENSE_HAT_AVAILABLE = True
+    return sense
 
 
 QUESTION_FILE = 'questions.json'
+SNAPSHOT_FILE = 'questions.snapshot'
+JOURNAL_FILE = 'questions.journal'
+IMPORT_MANIFEST_FILE = 'questions.imports.json'
+
+# Journal tuning
+STORE_SYNC_EVERY = 32            # fsync after this many appended mutations...
+STORE_SYNC_INTERVAL = 0.5        # ...or once this many seconds have passed
+STORE_COMPACT_BYTES = 4 * 1024 * 1024   # ...or the snapshot's size, if that is larger
+STORE_SETMANY_MIN = 64
+
+POOL_EMPTY = -1
+POOL_DELETED = -2
+
+class AnswerPool:
+    """Interned answer strings addressed by integer id.
+
+    texts holds each distinct answer once; slots is an open-addressing hash
+    table of ids into it, so finding an answer's id costs no per-answer
+    Python objects. Ids are reference counted; an answer no question uses
+    any more is dropped and its id reused. A question's answers are kept as
+    a single id or, when there are several, an array of ids.
+    """
+
+    def __init__(self):
+        self.texts = []           # id -> answer (None while the id is free)
+        self.refs = array('I')    # id -> number of uses
+        self.free = array('I')
+        self.slots = array('i', [POOL_EMPTY]) * 8
+        self.used = 0             # slots not POOL_EMPTY
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _probe(self, answer):
+        """Return (slot holding answer, -1 if none; slot a new id for it can go in)."""
+        slots, texts, mask = self.slots, self.texts, len(self.slots) - 1
+        i = hash(answer) & mask
+        reuse = -1
+        while True:
+            j = slots[i]
+            if j == POOL_EMPTY:
+                return -1, i if reuse < 0 else reuse
+            if j == POOL_DELETED:
+                if reuse < 0:
+                    reuse = i
+            elif texts[j] == answer:
+                return i, i
+            i = (i + 1) & mask
+
+    def _resize(self):
+        size = 8
+        while size < self.count * 2:
+            size *= 2
+        self.slots = slots = array('i', [POOL_EMPTY]) * size
+        mask = size - 1
+        for j, text in enumerate(self.texts):
+            if text is not None:
+                i = hash(text) & mask
+                while slots[i] != POOL_EMPTY:
+                    i = (i + 1) & mask
+                slots[i] = j
+        self.used = self.count
+
+    def acquire_one(self, answer):
+        slot, free_slot = self._probe(answer)
+        if slot >= 0:
+            i = self.slots[slot]
+        else:
+            if self.free:
+                i = self.free.pop()
+                self.texts[i] = answer
+            else:
+                i = len(self.texts)
+                self.texts.append(answer)
+                self.refs.append(0)
+            if self.slots[free_slot] == POOL_EMPTY:
+                self.used += 1
+            self.slots[free_slot] = i
+            self.count += 1
+            if self.used * 4 >= len(self.slots) * 3:
+                self._resize()
+        self.refs[i] += 1
+        return i
+
+    def acquire(self, answers):
+        """Return the ids for answers, taking a reference on each."""
+        if len(answers) == 1:
+            return self.acquire_one(answers[0])
+        return array('I', [self.acquire_one(answer) for answer in answers])
+
+    def release(self, ids):
+        for i in ((ids,) if type(ids) is int else ids):
+            self.refs[i] -= 1
+            if not self.refs[i]:
+                self.slots[self._probe(self.texts[i])[0]] = POOL_DELETED
+                self.texts[i] = None
+                self.free.append(i)
+                self.count -= 1
+
+    def resolve(self, ids):
+        """Return a new list of the answers behind ids."""
+        texts = self.texts
+        if type(ids) is int:
+            return [texts[ids]]
+        return [texts[i] for i in ids]
+
+class QuestionStore(MutableMapping):
+    """The stored_questions mapping of question -> answer list, kept compact.
+
+    Answers live once in a shared AnswerPool and each question only holds
+    their ids. Reading a value builds a new list of str; assign a new list
+    to change it.
+    """
+
+    def __init__(self, data=()):
+        self.pool = AnswerPool()
+        self.entries = {}         # question -> answer id or array of ids
+        self.update(data)
+
+    def fill(self, data):
+        """Load a plain question -> answer list dict into this empty store.
+
+        Empties data's answer lists as it goes, so duplicate answer strings
+        are freed while the pool fills.
+        """
+        pool, entries = self.pool, self.entries
+        ids = {}
+        intern = ids.setdefault
+        for key, answers in data.items():
+            if len(answers) == 1:
+                entries[key] = intern(answers[0], len(ids))
+            else:
+                entries[key] = array('I', [intern(answer, len(ids)) for answer in answers])
+            answers.clear()
+        pool.texts = list(ids)
+        pool.refs = refs = array('I', bytes(4 * len(ids)))
+        del ids
+        for row in entries.values():
+            if type(row) is int:
+                refs[row] += 1
+            else:
+                for i in row:
+                    refs[i] += 1
+        pool.count = len(pool.texts)
+        pool._resize()
+
+    def __getitem__(self, key):
+        return self.pool.resolve(self.entries[key])
+
+    def get(self, key, default=None):
+        ids = self.entries.get(key)
+        return default if ids is None else self.pool.resolve(ids)
+
+    def ids(self, key):
+        """Return the answer ids stored for key, or None."""
+        return self.entries.get(key)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __setitem__(self, key, answers):
+        ids = self.pool.acquire(answers)
+        old = self.entries.get(key)
+        self.entries[key] = ids
+        if old is not None:
+            self.pool.release(old)
+
+    def __delitem__(self, key):
+        self.pool.release(self.entries.pop(key))
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def memory_usage(self):
+        """Approximate bytes held by the store, next to what a plain dict of lists would take."""
+        import sys
+
+        pool = self.pool
+        keys_bytes = sys.getsizeof(self.entries) + sum(sys.getsizeof(key) for key in self.entries)
+        ids_bytes = sum(sys.getsizeof(ids) for ids in self.entries.values())
+        text_sizes = [sys.getsizeof(text) if text is not None else 0 for text in pool.texts]
+        pool_bytes = (sys.getsizeof(pool.texts) + sys.getsizeof(pool.refs) + sys.getsizeof(pool.free)
+                      + sys.getsizeof(pool.slots) + sum(text_sizes))
+        answers = 0
+        plain_bytes = keys_bytes
+        for ids in self.entries.values():
+            ids = (ids,) if type(ids) is int else ids
+            answers += len(ids)
+            plain_bytes += sys.getsizeof([None] * len(ids)) + sum(text_sizes[i] for i in ids)
+        return {
+            "questions": len(self.entries),
+            "answers": answers,
+            "unique_answers": len(pool),
+            "keys_bytes": keys_bytes,
+            "answer_ids_bytes": ids_bytes,
+            "answer_pool_bytes": pool_bytes,
+            "total_bytes": keys_bytes + ids_bytes + pool_bytes,
+            "plain_dict_bytes": plain_bytes,
+        }
+
+def print_memory_usage(usage):
+    kb = 1024
+    print(f"📦 {usage['questions']} question(s), {usage['answers']} answer(s), {usage['unique_answers']} unique.")
+    print(f"   question keys: {usage['keys_bytes'] / kb:12,.0f} KB")
+    print(f"   answer ids:    {usage['answer_ids_bytes'] / kb:12,.0f} KB")
+    print(f"   answer pool:   {usage['answer_pool_bytes'] / kb:12,.0f} KB")
+    print(f"   total:         {usage['total_bytes'] / kb:12,.0f} KB (as a plain dict of lists: {usage['plain_dict_bytes'] / kb:,.0f} KB)")
 
 # Default hardcoded questions
 questions = {}
 
-stored_questions = {}
+stored_questions = QuestionStore()
 
 question_variants = {
     "what's your name?": "what is your name?",
@@ -125,33 +632,10 @@ question_variants = {
     "how do i reach lecturing hall xxx?": "where is lecturing hall xxx?"
 }
 
-keyword_map = {
-    "python": [
-        "what is python?",
-        "how do you find python language?",
-        "how do you know python?"
-    ],
-    "chatbot": [
-        "what can i do with chatbot?",
-        "what information are available on chatbot?"
-    ],
-    "weather": [
-        "how is the weather today?"
-    ],
-    "personal": [
-        "what is your name?",
-        "what is your age?",
-        "where do you live?",
-        "what are you study in germany?"
-    ],
-    "lecture hall": [
-        "where is lecturing hall xxx?",
-        "what is the location of lecturing hall xxx?",
-        "where is lecturing hall xxx located?",
-        "how do i reach lecturing hall xxx?"
-    ]
-    
-}
+# Variants that came in through imports (normalized variant -> canonical question).
+# Unlike the ones above they are journaled with stored_questions.
+stored_variants = {}
+
 trivia_questions = [
     {
         "question": "What is the name of the university cafeteria at many German universities?",
@@ -267,264 +751,1953 @@ def normalize_question(q):
     q = re.sub(r'\s+', ' ', q)
     return q
 
+# Latency histogram bucket bounds, in seconds
+METRIC_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+class Metrics:
+    """Per-stage latency histograms, counters and gauges.
+
+    Call sites check `metrics.enabled` before reading the clock, so a
+    disabled instance costs one attribute lookup per stage.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}      # stage -> [bucket counts..., +Inf count], total seconds, count, max
+        self.counters = {}
+        self.gauges = {}      # name -> zero-argument callable
+
+    def observe(self, stage, seconds):
+        entry = self.stages.get(stage)
+        if entry is None:
+            entry = self.stages[stage] = [[0] * (len(METRIC_BUCKETS) + 1), 0.0, 0, 0.0]
+        entry[0][bisect.bisect_left(METRIC_BUCKETS, seconds)] += 1
+        entry[1] += seconds
+        entry[2] += 1
+        if seconds > entry[3]:
+            entry[3] = seconds
+
+    def lap(self, stage, start):
+        """Record the time since start under stage and return the new start time."""
+        now = time.perf_counter()
+        self.observe(stage, now - start)
+        return now
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def summary(self):
+        lines = ["\n--- Chatbot Stats ---", f"{'stage':<12}{'count':>10}{'mean ms':>12}{'max ms':>12}"]
+        for stage, (_, total, count, worst) in sorted(self.stages.items()):
+            lines.append(f"{stage:<12}{count:>10}{total / count * 1000:>12.3f}{worst * 1000:>12.3f}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name}: {value}")
+        for name, fn in sorted(self.gauges.items()):
+            lines.append(f"{name}: {fn()}")
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """Render everything in the Prometheus text exposition format."""
+        lines = ["# TYPE chatbot_stage_seconds histogram"]
+        for stage, (buckets, total, count, _) in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, n in zip(METRIC_BUCKETS + ("+Inf",), buckets):
+                cumulative += n
+                lines.append(f'chatbot_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'chatbot_stage_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(f'chatbot_stage_seconds_count{{stage="{stage}"}} {count}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE chatbot_{name}_total counter")
+            lines.append(f"chatbot_{name}_total {value}")
+        for name, fn in sorted(self.gauges.items()):
+            lines.append(f"# TYPE chatbot_{name} gauge")
+            lines.append(f"chatbot_{name} {fn()}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Chatbot CLI")
 
     parser.add_argument("--list-questions", action="store_true",
                         help="List all available questions and exit.")
+    parser.add_argument("--query", type=str, nargs="?", const="", metavar="PATTERN",
+                        help="Page through the questions and variants matching PATTERN (all of them if omitted), "
+                             "alphabetically; see --match, --sort, --desc, --limit, --offset and --json.")
+    parser.add_argument("--match", type=str, choices=QUERY_MODES, default="prefix",
+                        help="How --query matches: prefix, contains (substring) or regex (default: prefix).")
+    parser.add_argument("--sort", type=str, choices=QUERY_SORTS, default="question",
+                        help="Order --query results by question text or by number of answers (default: question).")
+    parser.add_argument("--desc", action="store_true",
+                        help="Reverse the --query order.")
+    parser.add_argument("--limit", type=int, default=QUERY_LIMIT,
+                        help=f"Results per --query page (default: {QUERY_LIMIT}).")
+    parser.add_argument("--offset", type=int, default=0,
+                        help="Results to skip before the --query page starts (default: 0).")
+    parser.add_argument("--json", action="store_true",
+                        help="Print --query results as JSON lines.")
     parser.add_argument("--question", type=str,
                         help="Ask the chatbot a question from the command line.")
     parser.add_argument("--import_questions", action="store_true",
-                        help="Import questions in bulk from a CSV or XLSX file.")
-    parser.add_argument("--filetype", type=str, choices=["CSV", "XLSX"],
-                        help="Type of import file: CSV or XLSX. Used with --import_questions.")
-    parser.add_argument("--filepath", type=str,
-                        help="Path to import file when using --import_questions.")
+                        help="Import questions in bulk from CSV, XLSX (every sheet), Parquet or Arrow files.")
+    parser.add_argument("--filetype", type=str, choices=["CSV", "XLSX", "PARQUET", "ARROW"],
+                        help="Type of import file: CSV, XLSX, PARQUET or ARROW (IPC); by default it follows the extension. "
+                             "With several files, only this type is picked up from globs and directories. "
+                             "PARQUET/ARROW files have a 'question' column and 'answers'/'variations' list columns.")
+    parser.add_argument("--filepath", type=str, nargs="+",
+                        help="File(s) to import with --import_questions: paths, globs (quote them; ** recurses) or "
+                             "directories. Several files are read in parallel (see --workers). Also the --export path.")
+    parser.add_argument("--upsert", action="store_true",
+                        help="With --import_questions: skip the file if it is unchanged since its last upsert, "
+                             "otherwise apply only the added, changed and deleted rows.")
     parser.add_argument("--add", action="store_true",
                         help="Add a new question and answer (requires --question and --answer).")
     parser.add_argument("--remove", action="store_true",
                         help="Remove an answer from a question, or remove a question entirely (requires --question, optional --answer).")
     parser.add_argument("--answer", type=str,
                         help="The answer to add or remove (used with --add or --remove).")
+    parser.add_argument("--export", action="store_true",
+                        help="Export the knowledge base to --filepath (default questions.json). A .parquet or "
+                             ".arrow/.feather/.ipc path, or --filetype PARQUET/ARROW, writes columnar lists instead of JSON.")
+    parser.add_argument("--compact", action="store_true",
+                        help="Fold the mutation journal into a fresh snapshot and exit.")
+    parser.add_argument("--memory", action="store_true",
+                        help="Print how much memory the loaded questions and answers take and exit.")
+    parser.add_argument("--compile", type=str, nargs="?", const=KB_FILE, metavar="PATH",
+                        help=f"Compile the knowledge base into a memory-mappable file (default: {KB_FILE}).")
+    parser.add_argument("--kb", type=str, metavar="PATH",
+                        help="Answer questions from a file written by --compile instead of loading the store. "
+                             "Read-only: recompile after changing questions.")
+    parser.add_argument("--batch", type=str, metavar="PATH",
+                        help="Answer every line of PATH ('-' for stdin) and write JSONL results.")
+    parser.add_argument("--output", type=str,
+                        help="Where --batch writes its JSONL results (default: stdout).")
+    parser.add_argument("--workers", type=int,
+                        help="Worker processes for --batch (default: 1) and for importing several files "
+                             "(default: one per CPU).")
+    parser.add_argument("--serve", action="store_true",
+                        help="Keep the knowledge base loaded and answer over HTTP (see --host/--port/--socket).")
+    parser.add_argument("--host", type=str, default=SERVER_HOST,
+                        help=f"Address for --serve to listen on (default: {SERVER_HOST}).")
+    parser.add_argument("--port", type=int, default=SERVER_PORT,
+                        help=f"TCP port for --serve (default: {SERVER_PORT}).")
+    parser.add_argument("--socket", type=str,
+                        help="Serve on this Unix socket path instead of TCP.")
+    parser.add_argument("--max-sessions", type=int, default=SESSION_MAX,
+                        help=f"Conversations --serve keeps at /chat before evicting the least recently used (default: {SESSION_MAX}).")
+    parser.add_argument("--session-timeout", type=float, default=SESSION_IDLE_TIMEOUT,
+                        help=f"Seconds an idle /chat conversation is kept (default: {SESSION_IDLE_TIMEOUT}).")
+    parser.add_argument("--connect", type=str,
+                        help="Send --question/--add/--remove/--import_questions to a running server, "
+                             "e.g. http://127.0.0.1:8765 or unix:/tmp/chatbot.sock.")
+    parser.add_argument("--simulate-sense-hat", action="store_true",
+                        help="Use a simulated Sense HAT (no hardware needed) for the LED display and sensor.")
+    parser.add_argument("--temperature-history", type=int, nargs="?", const=10, metavar="N",
+                        help="Sample the temperature N times (default 10, at most "
+                             f"{TEMP_HISTORY_SIZE}) at --sample-interval and print the readings.")
+    parser.add_argument("--sample-interval", type=float, default=TEMP_SAMPLE_INTERVAL,
+                        help=f"Seconds between temperature readings (default: {TEMP_SAMPLE_INTERVAL}).")
+    parser.add_argument("--stats", action="store_true",
+                        help="Collect per-stage timings and counters; print them on exit and serve them at /metrics.")
+    parser.add_argument("--cache-size", type=int, default=ANSWER_CACHE_SIZE,
+                        help=f"Recently asked inputs whose resolved questions are cached; 0 disables (default: {ANSWER_CACHE_SIZE}).")
     parser.add_argument("--log", action="store_true", 
                         help="Enable writing actions to chatbot.log file.")
     parser.add_argument("--loglevel", type=str, choices=["INFO", "WARNING"],
                         help="Logging level for chatbot.log (default: WARNING)")
+    parser.add_argument("--log-rotate", type=str, choices=["size", "time", "none"], default="size",
+                        help="Rotate chatbot.log by size or time; old files are gzipped (default: size).")
+    parser.add_argument("--log-max-bytes", type=int, default=LOG_MAX_BYTES,
+                        help=f"Size at which chatbot.log rotates with --log-rotate size (default: {LOG_MAX_BYTES}).")
+    parser.add_argument("--log-when", type=str, default="midnight",
+                        help="Rotation interval for --log-rotate time, e.g. midnight, H, D (default: midnight).")
+    parser.add_argument("--log-backups", type=int, default=LOG_BACKUPS,
+                        help=f"Rotated log files to keep (default: {LOG_BACKUPS}).")
+    parser.add_argument("--fuzzy", action="store_true",
+                        help="Fall back to the closest stored question when there is no exact match.")
+    parser.add_argument("--spellcheck", action="store_true",
+                        help="Correct misspelled words against the known questions when there is no exact match.")
+    parser.add_argument("--fuzzy-threshold", type=float, default=FUZZY_THRESHOLD,
+                        help=f"Minimum similarity (0-1) for a fuzzy match (default: {FUZZY_THRESHOLD}).")
 
     return parser.parse_args()
 
+def apply_journal_op(data, variants, op):
+    if op["op"] == "set":
+        data[op["q"]] = op["a"]
+    elif op["op"] == "setmany":
+        data.update(op["qa"])
+    elif op["op"] == "del":
+        data.pop(op["q"], None)
+    elif op["op"] == "variants":
+        for variant, canonical in op["va"].items():
+            if canonical is None:
+                variants.pop(variant, None)
+            else:
+                variants[variant] = canonical
+
+def journal_op_keys(op):
+    if op["op"] == "variants":
+        return ()
+    return op["qa"].keys() if op["op"] == "setmany" else (op["q"],)
+
+class FileLock:
+    """Exclusive advisory lock on a file, shared by every process that opens the same store.
+
+    Re-entrant within the thread that holds it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.depth = 0
+
+    def acquire(self, blocking=True):
+        if self.depth:
+            self.depth += 1
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except ImportError:
+                import msvcrt
+                msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            if blocking:
+                raise
+            return False
+        self.fd = fd
+        self.depth = 1
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            # Closing the descriptor drops the lock
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+def file_stamp(path):
+    """Return (inode, size, mtime) for path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+class JournalStore:
+    """Append-only mutation journal on top of a periodically compacted snapshot.
+
+    Every journal starts with a {"generation": n} header. The snapshot records
+    the newest generation it already contains, so journals at or below it are
+    skipped on replay. Ops are full-state ("set" a question's answers or "del"
+    it), which keeps replaying them idempotent.
+
+    Several processes can share one store. Writers hold questions.lock while
+    they append, and changes() returns whatever other processes journaled
+    since this one last looked: (generation, offset) says how far we have
+    read, and `seen` stamps the files so an unchanged store costs two stats.
+    """
+
+    def __init__(self, snapshot_path, journal_path, legacy_path=None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + ".compacting"
+        self.legacy_path = legacy_path
+        base = os.path.splitext(journal_path)[0]
+        self.lock = threading.RLock()
+        self.file_lock = FileLock(base + ".lock")
+        self.compact_lock = FileLock(base + ".compact.lock")
+        self.journal = None
+        self.generation = 0      # newest journal generation read so far...
+        self.valid_bytes = 0     # ...and how many of its bytes
+        self.sealed = True       # whether that journal can no longer grow
+        self.seen = None
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.compactor = None
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Hold the store against other threads and processes."""
+        with self.lock, self.file_lock:
+            yield
+
+    def stamp(self):
+        return file_stamp(self.journal_path), file_stamp(self.snapshot_path)
+
+    def _read_journal(self, path, resume=None):
+        """Return (generation, ops, valid_bytes) for a journal, stopping at a torn last line.
+
+        resume is a (generation, offset) pair: if the journal has that
+        generation, only ops after offset are returned.
+        """
+        ops = []
+        generation = 0
+        valid_bytes = 0
+        if not os.path.exists(path):
+            return generation, ops, valid_bytes
+        with open(path, 'rb') as f:
+            for i, line in enumerate(f):
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+                if i == 0 and "generation" in record:
+                    generation = record["generation"]
+                    if resume and resume[0] == generation and resume[1] > valid_bytes:
+                        f.seek(resume[1])
+                        valid_bytes = resume[1]
+                else:
+                    ops.append(record)
+        return generation, ops, valid_bytes
+
+    def load(self):
+        """Return (questions, variants) as of the snapshot plus every journaled op."""
+        with self.locked():
+            data = {}
+            variants = {}
+            snapshot_generation = 0
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, 'r') as f:
+                    snapshot = json.load(f)
+                data = snapshot["questions"]
+                variants = snapshot.get("variants", {})
+                snapshot_generation = snapshot["generation"]
+            elif self.legacy_path and os.path.exists(self.legacy_path):
+                with open(self.legacy_path, 'r') as f:
+                    data = json.load(f)
+
+            self.generation = snapshot_generation
+            self.valid_bytes = 0
+            self.sealed = True
+            for path in (self.compacting_path, self.journal_path):
+                generation, ops, valid_bytes = self._read_journal(path)
+                if generation > snapshot_generation:
+                    for op in ops:
+                        apply_journal_op(data, variants, op)
+                    self.generation = generation
+                    self.valid_bytes = valid_bytes
+                    self.sealed = path == self.compacting_path
+            self.seen = self.stamp()
+            return data, variants
+
+    def changes(self):
+        """Return the ops journaled by other processes since load() or the last call.
+
+        Returns None if a compaction folded away ops we had not read yet; the
+        caller must load() again. Call with the store locked.
+        """
+        stamp = self.stamp()
+        if stamp == self.seen:
+            return []
+        ops = []
+        files_read = False
+        for path in (self.compacting_path, self.journal_path):
+            generation, file_ops, valid_bytes = self._read_journal(path, (self.generation, self.valid_bytes))
+            if not valid_bytes or generation < self.generation:
+                continue
+            if generation != self.generation and not (self.sealed and generation == self.generation + 1):
+                return None
+            ops.extend(file_ops)
+            self.generation = generation
+            self.valid_bytes = valid_bytes
+            self.sealed = path == self.compacting_path
+            files_read = True
+        if not files_read and stamp[1] != self.seen[1]:
+            # Someone compacted and we can't tell what the new snapshot holds
+            return None
+        self.seen = stamp
+        return ops
+
+    def _open_journal(self):
+        if self.journal is not None:
+            current = file_stamp(self.journal_path)
+            if current is None or current[0] != os.fstat(self.journal.fileno()).st_ino:
+                # Another process moved our journal aside to compact it
+                self.journal.close()
+                self.journal = None
+        if self.journal is None:
+            is_new = not os.path.exists(self.journal_path)
+            if not is_new and os.path.getsize(self.journal_path) > self.valid_bytes:
+                # Drop a torn tail so new ops are not appended behind it
+                os.truncate(self.journal_path, self.valid_bytes)
+            self.journal = open(self.journal_path, 'ab')
+            if is_new:
+                self.generation += 1
+                self.sealed = False
+                self.journal.write(json.dumps({"generation": self.generation}).encode() + b"\n")
+
+    def _sync(self):
+        if self.journal is not None and self.unsynced:
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def append(self, ops):
+        """Append mutations; they reach the OS at once and disk in fsync batches.
+
+        Call with the store locked and after changes(), so the journal is ours to extend.
+        """
+        if not ops:
+            return
+        with self.locked():
+            self._open_journal()
+            self.journal.write(b"".join(json.dumps(op).encode() + b"\n" for op in ops))
+            self.journal.flush()
+            self.valid_bytes = self.journal.tell()
+            self.seen = self.stamp()
+            self.unsynced += len(ops)
+            if self.unsynced >= STORE_SYNC_EVERY or time.monotonic() - self.last_sync >= STORE_SYNC_INTERVAL:
+                self._sync()
+
+    def needs_compaction(self):
+        # Scaling with the snapshot keeps rewrites amortized linear during big imports
+        if self.journal is None:
+            return False
+        snapshot = self.seen[1] if self.seen else None
+        return self.journal.tell() >= max(STORE_COMPACT_BYTES, snapshot[1] if snapshot else 0)
+
+    def compact(self, data, variants, wait=False):
+        """Fold the journal into a new snapshot on a background thread.
+
+        data and variants must be the state as of the last changes()/append(). Returns False
+        (and does nothing) if another process has written since or is compacting.
+        """
+        with self.locked():
+            if self.compactor is not None and self.compactor.is_alive():
+                return False
+            if self.stamp() != self.seen or not self.compact_lock.acquire(blocking=False):
+                return False
+            self._sync()
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            if os.path.exists(self.journal_path):
+                if os.path.exists(self.compacting_path):
+                    # Left over from an interrupted compaction: keep its ops
+                    _, ops, _ = self._read_journal(self.journal_path)
+                    with open(self.compacting_path, 'ab') as f:
+                        f.write(b"".join(json.dumps(op).encode() + b"\n" for op in ops))
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, self.compacting_path)
+            self.sealed = True
+            self.seen = self.stamp()
+            generation = self.generation
+            copy = {q: list(answers) for q, answers in data.items()}
+            self.compactor = threading.Thread(target=self._write_snapshot, args=(copy, dict(variants), generation),
+                                              daemon=True)
+            self.compactor.start()
+        if wait:
+            self.compactor.join()
+        return True
+
+    def _write_snapshot(self, data, variants, generation):
+        try:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"generation": generation, "questions": data, "variants": variants}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            with self.locked():
+                before = file_stamp(self.snapshot_path)
+                os.replace(tmp_path, self.snapshot_path)
+                if os.path.exists(self.compacting_path):
+                    os.remove(self.compacting_path)
+                if self.seen[1] == before:
+                    # Our own snapshot is not news to us
+                    self.seen = (self.seen[0], file_stamp(self.snapshot_path))
+        finally:
+            self.compact_lock.release()
+
+    def close(self):
+        if self.compactor is not None:
+            self.compactor.join()
+        with self.lock:
+            self._sync()
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+
+store = JournalStore(SNAPSHOT_FILE, JOURNAL_FILE, legacy_path=QUESTION_FILE)
+atexit.register(store.close)
+
 def load_questions():
     global stored_questions
-    if os.path.exists(QUESTION_FILE):
-        with open(QUESTION_FILE, 'r') as f:
-            stored_questions = json.load(f)
-
-def save_questions():
-    with open(QUESTION_FILE, 'w') as f:
-        json.dump(stored_questions, f, indent=2)
+    data, variants = store.load()
+    stored_questions = QuestionStore()
+    stored_questions.fill(data)
+    for variant in stored_variants.keys() - variants.keys():
+        question_variants.pop(variant, None)
+    stored_variants.clear()
+    stored_variants.update(variants)
+    question_variants.update(variants)
+    rebuild_question_index()
+
+def apply_store_changes():
+    """Apply ops other processes journaled since we last looked; call with the store locked.
+
+    Returns the changed keys, or None if the knowledge base had to be reloaded.
+    """
+    ops = store.changes()
+    if ops is None:
+        load_questions()
+        return None
+    keys = []
+    for op in ops:
+        if op["op"] == "variants":
+            apply_variant_changes(op["va"])
+            continue
+        apply_journal_op(stored_questions, stored_variants, op)
+        keys.extend(journal_op_keys(op))
+    keys = list(dict.fromkeys(keys))
+    for key in keys:
+        index_question(key)
+    return keys
+
+def sync_questions():
+    """Bring stored_questions up to date with writes from other processes."""
+    with store.locked():
+        return apply_store_changes()
+
+RELOAD_CHECK_INTERVAL = 0.5    # seconds between store checks in long-running modes
+last_reload_check = 0.0
+
+def refresh_questions(args):
+    """Pick up questions other processes wrote since we last looked.
+
+    Meant to be called before every request in long-running modes: between
+    checks it is free, and an unchanged store costs two stats. Only the
+    changed keys are applied to stored_questions and the indexes.
+    """
+    global last_reload_check
+    if compiled_kb is not None or store.seen is None:
+        return
+    now = time.monotonic()
+    if now - last_reload_check < RELOAD_CHECK_INTERVAL:
+        return
+    last_reload_check = now
+    if store.stamp() == store.seen:
+        return
+    keys = sync_questions()
+    if keys is None:
+        if args.log:
+            logging.info("Reloaded the knowledge base after another process compacted it.")
+    elif keys:
+        if metrics.enabled:
+            metrics.count("reloaded_questions", len(keys))
+        if args.log:
+            logging.info("Picked up %s question(s) changed by another process.", len(keys))
+
+def persist_questions(keys, variants=None):
+    """Journal the current state of each key in stored_questions, plus any variant changes."""
+    ops = []
+    present = {}
+    for key in keys:
+        if key in stored_questions:
+            present[key] = stored_questions[key]
+        else:
+            ops.append({"op": "del", "q": key})
+    if len(present) > STORE_SETMANY_MIN:
+        # Bulk writes (imports) are encoded as one line instead of one op per key
+        ops.append({"op": "setmany", "qa": present})
+    else:
+        ops.extend({"op": "set", "q": key, "a": answers} for key, answers in present.items())
+    if variants:
+        ops.append({"op": "variants", "va": variants})
+    store.append(ops)
+    if store.needs_compaction():
+        store.compact(stored_questions, stored_variants)
+
+def update_questions(compute, variants=None):
+    """Apply and journal compute()'s changes without losing other processes' writes.
+
+    compute() returns {normalized key: new answer list, or None to delete}
+    based on the current stored_questions, and must not modify it. It runs
+    optimistically, outside the store lock; if another process wrote in the
+    meantime, their ops are applied and compute() runs again. The lock is only
+    held to compare versions and append.
+
+    variants ({normalized variant: canonical question, or None to drop it}) is
+    applied and journaled along with the question changes.
+    """
+    sync_questions()
+    while True:
+        version = store.seen
+        changes = compute()
+        with store.locked():
+            if store.stamp() != version:
+                apply_store_changes()
+                continue
+            for key, answers in changes.items():
+                if answers is None:
+                    stored_questions.pop(key, None)
+                else:
+                    stored_questions[key] = answers
+                index_question(key, key)
+            if variants:
+                apply_variant_changes(variants)
+            persist_questions(changes, variants)
+            return changes
+
+def save_questions(path=QUESTION_FILE):
+    """Export stored_questions as a plain JSON file."""
+    with open(path, 'w') as f:
+        json.dump(dict(stored_questions), f, indent=2)
 
 def get_all_questions():
     all_q = questions.copy()
     all_q.update(stored_questions)
     return all_q
 
+# Normalized question -> answer ids (see AnswerPool), covering questions and stored_questions
+question_index = {}
+
+# Normalized variant -> normalized canonical question
+variant_index = {}
+
+def hardcoded_answer_ids(key):
+    """Intern a hardcoded question's answers into the store's pool (they are never released)."""
+    answers = questions.get(key)
+    return None if answers is None else stored_questions.pool.acquire(answers)
+
+def index_question(key, nq=None):
+    """Point the index entry for key at its current answer ids.
+
+    Pass nq when the normalized form of key is already known.
+    """
+    answers = stored_questions.ids(key)
+    if answers is None:
+        answers = hardcoded_answer_ids(key)
+    if answers is None:
+        unindex_question(key)
+    else:
+        if nq is None:
+            nq = normalize_question(key)
+        question_index[nq] = answers
+        if fuzzy_matcher is not None:
+            fuzzy_matcher.add(nq)
+        if keyword_index is not None:
+            keyword_index.add(nq)
+        if prefix_index is not None:
+            prefix_index.add(nq)
+        if spell_index is not None:
+            spell_index.add(nq)
+    answer_cache.invalidate(nq)
+
+def unindex_question(key):
+    """Drop key from the index, falling back to a hardcoded entry if one exists."""
+    nq = normalize_question(key)
+    question_index.pop(nq, None)
+    if key in questions:
+        question_index[nq] = hardcoded_answer_ids(key)
+    else:
+        if fuzzy_matcher is not None:
+            fuzzy_matcher.remove(nq)
+        if keyword_index is not None:
+            keyword_index.remove(nq)
+        # A key that is still a variant stays suggestible and spellable
+        if nq not in variant_index:
+            if prefix_index is not None:
+                prefix_index.remove(nq)
+            if spell_index is not None:
+                spell_index.remove(nq)
+    answer_cache.invalidate(nq)
+
+def add_variant(variant, canonical):
+    question_variants[variant] = canonical
+    nv = normalize_question(variant)
+    variant_index[nv] = normalize_question(canonical)
+    if prefix_index is not None:
+        prefix_index.add(nv)
+    if spell_index is not None:
+        spell_index.add(nv)
+    answer_cache.invalidate(nv)
+
+def remove_variant(variant):
+    question_variants.pop(variant, None)
+    nv = normalize_question(variant)
+    variant_index.pop(nv, None)
+    if nv not in question_index:
+        if prefix_index is not None:
+            prefix_index.remove(nv)
+        if spell_index is not None:
+            spell_index.remove(nv)
+    answer_cache.invalidate(nv)
+
+def apply_variant_changes(changes):
+    """Apply {normalized variant: canonical question, or None to drop it} to stored_variants and the indexes."""
+    for variant, canonical in changes.items():
+        if canonical is None:
+            if stored_variants.pop(variant, None) is not None:
+                remove_variant(variant)
+        else:
+            stored_variants[variant] = canonical
+            add_variant(variant, canonical)
+
+def rebuild_question_index():
+    global fuzzy_matcher, keyword_index, prefix_index, spell_index
+    fuzzy_matcher = None
+    keyword_index = None
+    prefix_index = None
+    spell_index = None
+    answer_cache.clear()
+    question_index.clear()
+    for key in questions:
+        question_index[normalize_question(key)] = hardcoded_answer_ids(key)
+    for key, ids in stored_questions.entries.items():
+        nq = normalize_question(key)
+        # Stored keys are normalized already; index them by the same string object
+        question_index[key if nq == key else nq] = ids
+    variant_index.clear()
+    for variant, canonical in question_variants.items():
+        variant_index[normalize_question(variant)] = normalize_question(canonical)
+
+def resolve_key(nq):
+    """Return the canonical key for the normalized question nq; a question of its own wins over a variant."""
+    return nq if nq in question_index else variant_index.get(nq, nq)
+
+def resolve_question(q):
+    """Return the normalized canonical form of q, with variants resolved."""
+    return resolve_key(normalize_question(q))
+
+def lookup_question(q):
+    """Return (canonical key, answers) for q, or (None, None) if it is not known."""
+    timed = metrics.enabled
+    if timed:
+        start = time.perf_counter()
+    key = resolve_question(q)
+    if timed:
+        start = metrics.lap("normalize", start)
+    answers = question_index.get(key)
+    if answers is not None:
+        answers = stored_questions.pool.resolve(answers)
+    elif compiled_kb is not None:
+        key, answers = compiled_kb.lookup(normalize_question(q))
+    if timed:
+        metrics.lap("lookup", start)
+    if answers is None:
+        return None, None
+    return key, answers
+
+def lookup_answers(q):
+    """Return the answer list for q, or None if it is not known."""
+    return lookup_question(q)[1]
+
+# ---------- Answer cache ----------
+
+ANSWER_CACHE_SIZE = 1024
+
+class AnswerCache:
+    """LRU cache from raw input text to the (sub-question, matched key) pairs it resolved to.
+
+    Each entry remembers the normalized keys it depends on, so invalidate(key)
+    drops exactly the inputs whose resolution could change. Entries that went
+    through fuzzy matching depend on every key. Only keys are cached; answers
+    are looked up (and picked at random) on every hit.
+    """
+
+    def __init__(self, size=ANSWER_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()   # text -> (resolved, deps)
+        self.dependents = {}           # key (None for "any key") -> texts
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, text):
+        entry = self.entries.get(text)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(text)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, text, resolved, deps):
+        if self.size <= 0:
+            return
+        if text in self.entries:
+            self._drop(text)
+        self.entries[text] = (resolved, deps)
+        for dep in deps:
+            self.dependents.setdefault(dep, set()).add(text)
+        if len(self.entries) > self.size:
+            self._drop(next(iter(self.entries)))
+
+    def _drop(self, text):
+        _, deps = self.entries.pop(text)
+        for dep in deps:
+            texts = self.dependents.get(dep)
+            if texts is not None:
+                texts.discard(text)
+                if not texts:
+                    del self.dependents[dep]
+
+    def invalidate(self, key):
+        if not self.entries:
+            return
+        for dep in (key, None):
+            for text in self.dependents.pop(dep, ()):
+                if text in self.entries:
+                    self._drop(text)
+
+    def clear(self):
+        self.entries.clear()
+        self.dependents.clear()
+
+answer_cache = AnswerCache()
+
+def answers_for_key(key):
+    """Return the current answer list for a matched key, or None if it is gone."""
+    answers = question_index.get(key)
+    if answers is not None:
+        return stored_questions.pool.resolve(answers)
+    if compiled_kb is not None:
+        answers = compiled_kb.lookup(key)[1]
+    return answers
+
+# ---------- Compiled knowledge base ----------
+#
+# Layout (little endian):
+#   header   KB_HEADER
+#   slots    open-addressing hash table of KB_SLOT, keyed by normalized question/variant
+#   refs     KB_REF (offset, length) for every distinct string
+#   answers  u32 ref ids; a slot owns answers[start:start + count]
+#   strings  UTF-8 string table
+#   meta     JSON object, reserved
+
+KB_MAGIC = b"CHATKB01"
+KB_HEADER = struct.Struct("<8sIIIIII6Q")
+KB_SLOT = struct.Struct("<QIIII")     # hash, key ref, canonical ref, answers start, answers count
+KB_REF = struct.Struct("<QI")
+KB_FILE = "questions.kb"
+
+compiled_kb = None
+
+def kb_hash(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+class CompiledKnowledgeBase:
+    """Read-only, memory-mapped view of a file written by compile_knowledge_base."""
+
+    def __init__(self, path):
+        import mmap
+
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, _, self.slot_count, self.entry_count, self.question_count, _, _,
+         self.slots_off, self.refs_off, self.answers_off, _, meta_off, meta_len) = KB_HEADER.unpack_from(self.mm, 0)
+        if magic != KB_MAGIC:
+            raise ValueError(f"'{path}' is not a compiled knowledge base")
+        self.meta = json.loads(self.mm[meta_off:meta_off + meta_len])
+
+    def __len__(self):
+        return self.question_count
+
+    def _bytes(self, ref):
+        offset, length = KB_REF.unpack_from(self.mm, self.refs_off + ref * KB_REF.size)
+        return self.mm[offset:offset + length]
+
+    def _answers(self, start, count):
+        refs = struct.unpack_from(f"<{count}I", self.mm, self.answers_off + start * 4)
+        return [self._bytes(ref).decode("utf-8") for ref in refs]
+
+    def lookup(self, nq):
+        """Return (canonical key, answers) for a normalized question or variant, or (None, None)."""
+        key = nq.encode("utf-8")
+        h = kb_hash(key)
+        mask = self.slot_count - 1
+        i = h & mask
+        while True:
+            slot_hash, key_ref, canonical_ref, start, count = KB_SLOT.unpack_from(self.mm, self.slots_off + i * KB_SLOT.size)
+            if count == 0:
+                return None, None
+            if slot_hash == h and self._bytes(key_ref) == key:
+                return self._bytes(canonical_ref).decode("utf-8"), self._answers(start, count)
+            i = (i + 1) & mask
+
+    def keys(self):
+        """Yield every canonical question (variants excluded)."""
+        for i in range(self.slot_count):
+            _, key_ref, canonical_ref, _, count = KB_SLOT.unpack_from(self.mm, self.slots_off + i * KB_SLOT.size)
+            if count and key_ref == canonical_ref:
+                yield self._bytes(key_ref).decode("utf-8")
+
+    def close(self):
+        self.mm.close()
+
+def compile_knowledge_base(path):
+    """Write questions and variants into one mmap-able file; returns the entry count."""
+    strings = {}
+    refs = []
+    blob = bytearray()
+
+    def ref(text):
+        ref_id = strings.get(text)
+        if ref_id is None:
+            data = text.encode("utf-8")
+            ref_id = strings[text] = len(refs)
+            refs.append((len(blob), len(data)))
+            blob.extend(data)
+        return ref_id
+
+    # normalized key -> (key ref, canonical ref, answers start, answers count)
+    entries = {}
+    answer_ids = []
+    for source in (questions, stored_questions):
+        for key, answers in source.items():
+            if answers:
+                nq = normalize_question(key)
+                key_ref = ref(nq)
+                entries[nq] = (key_ref, key_ref, len(answer_ids), len(answers))
+                answer_ids.extend(ref(answer) for answer in answers)
+    question_count = len(entries)
+    for variant, canonical in question_variants.items():
+        nv = normalize_question(variant)
+        target = entries.get(normalize_question(canonical))
+        if target is not None and nv not in entries:
+            entries[nv] = (ref(nv), target[1], target[2], target[3])
+
+    slot_count = 8
+    while slot_count < 2 * len(entries):
+        slot_count *= 2
+    slots = bytearray(slot_count * KB_SLOT.size)
+    mask = slot_count - 1
+    for nq, (key_ref, canonical_ref, start, count) in entries.items():
+        h = kb_hash(nq.encode("utf-8"))
+        i = h & mask
+        while KB_SLOT.unpack_from(slots, i * KB_SLOT.size)[4]:
+            i = (i + 1) & mask
+        KB_SLOT.pack_into(slots, i * KB_SLOT.size, h, key_ref, canonical_ref, start, count)
+
+    meta = b"{}"
+    slots_off = KB_HEADER.size
+    refs_off = slots_off + len(slots)
+    answers_off = refs_off + len(refs) * KB_REF.size
+    strings_off = answers_off + len(answer_ids) * 4
+    meta_off = strings_off + len(blob)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(KB_HEADER.pack(KB_MAGIC, 1, slot_count, len(entries), question_count, len(refs), len(answer_ids),
+                               slots_off, refs_off, answers_off, strings_off, meta_off, len(meta)))
+        f.write(slots)
+        f.write(b"".join(KB_REF.pack(strings_off + offset, length) for offset, length in refs))
+        f.write(struct.pack(f"<{len(answer_ids)}I", *answer_ids))
+        f.write(blob)
+        f.write(meta)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+def attach_compiled_kb(path):
+    """Answer lookups from a compiled knowledge base instead of loading the store."""
+    global compiled_kb
+    compiled_kb = CompiledKnowledgeBase(path)
+
+# Fuzzy fallback settings
+FUZZY_NGRAM = 3
+FUZZY_THRESHOLD = 0.6
+FUZZY_MERGE_EVERY = 256     # pending questions scored in Python before a matrix rebuild
+FUZZY_COMMON_DF = 0.05      # n-grams in more than this share of questions skip candidate search
+FUZZY_MIN_RARE = 3          # always rank on at least this many n-grams
+FUZZY_CANDIDATES = 64
+
+def char_ngrams(text, n=FUZZY_NGRAM):
+    padded = f" {text} "
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+class FuzzyMatcher:
+    """Char n-gram TF-IDF index with cosine scoring over normalized questions.
+
+    Merged questions live in a sparse matrix (rows L2-normalised, columns
+    weighted by IDF). New questions wait in a small pending set and are
+    folded into the matrix once it grows past FUZZY_MERGE_EVERY.
+    """
+
+    def __init__(self):
+        self.vocab = {}
+        self.keys = []
+        self.rows = {}
+        self.pending = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.tf = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.matrix = sparse.csc_matrix((0, 0), dtype=np.float32)
+        self.df = np.zeros(0, dtype=np.int64)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.max_idf = 1.0
+
+    def __len__(self):
+        return len(self.rows) + len(self.pending)
+
+    def _counts(self, text, grow):
+        counts = {}
+        unknown = 0
+        for gram in char_ngrams(text):
+            col = self.vocab.get(gram)
+            if col is None:
+                if not grow:
+                    unknown += 1
+                    continue
+                col = self.vocab[gram] = len(self.vocab)
+            counts[col] = counts.get(col, 0) + 1
+        return counts, unknown
+
+    def _idf(self, col):
+        return self.idf[col] if col < len(self.idf) else self.max_idf
+
+    def add(self, key):
+        if not key or key in self.rows or key in self.pending:
+            return
+        self.pending[key] = self._counts(key, grow=True)[0]
+
+    def add_many(self, keys):
+        for key in keys:
+            self.add(key)
+        if len(self.pending) > FUZZY_MERGE_EVERY:
+            self.merge()
+
+    def remove(self, key):
+        if self.pending.pop(key, None) is None:
+            row = self.rows.pop(key, None)
+            if row is not None:
+                self.alive[row] = False
+
+    def merge(self):
+        """Fold pending questions into the matrix and recompute IDF weights."""
+        ncols = len(self.vocab)
+        keep = np.flatnonzero(self.alive)
+        tf = self.tf if keep.size == self.tf.shape[0] else self.tf[keep]
+        tf = sparse.csr_matrix((tf.data, tf.indices, tf.indptr), shape=(tf.shape[0], ncols))
+        keys = [self.keys[row] for row in keep]
+
+        if self.pending:
+            indptr = [0]
+            indices = []
+            data = []
+            for key, counts in self.pending.items():
+                keys.append(key)
+                indices.extend(counts.keys())
+                data.extend(counts.values())
+                indptr.append(len(indices))
+            new_rows = sparse.csr_matrix(
+                (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr)),
+                shape=(len(self.pending), ncols))
+            tf = sparse.vstack([tf, new_rows], format="csr")
+
+        nrows = tf.shape[0]
+        self.df = np.bincount(tf.indices, minlength=ncols)
+        self.idf = (np.log((1 + nrows) / (1 + self.df)) + 1).astype(np.float32)
+        self.max_idf = math.log(1 + nrows) + 1
+
+        weights = tf.copy()
+        weights.data *= self.idf[weights.indices]
+        norms = np.sqrt(np.add.reduceat(weights.data ** 2, weights.indptr[:-1])) if nrows else np.zeros(0)
+        weights.data /= np.repeat(norms, np.diff(weights.indptr)).astype(np.float32)
+        self.norms = norms
+        self.matrix = weights.tocsc()
+        self.matrix.sort_indices()
+
+        self.tf = tf
+        self.keys = keys
+        self.rows = {key: row for row, key in enumerate(keys)}
+        self.alive = np.ones(nrows, dtype=bool)
+        self.pending = {}
+
+    def best_match(self, text, threshold=FUZZY_THRESHOLD):
+        """Return (key, score) of the closest question, or (None, 0.0) below threshold."""
+        if len(self.pending) > FUZZY_MERGE_EVERY:
+            self.merge()
+        counts, unknown = self._counts(text, grow=False)
+        if not counts:
+            return None, 0.0
+        query = {col: n * self._idf(col) for col, n in counts.items()}
+        qnorm = math.sqrt(sum(w * w for w in query.values()) + (unknown * self.max_idf) ** 2)
+
+        best_key, best_score = None, 0.0
+        if self.rows:
+            best_key, best_score = self._score_matrix(query)
+        for key, doc in self.pending.items():
+            dot = 0.0
+            norm = 0.0
+            for col, n in doc.items():
+                w = n * self._idf(col)
+                norm += w * w
+                if col in query:
+                    dot += w * query[col]
+            score = dot / math.sqrt(norm) if norm else 0.0
+            if score > best_score:
+                best_key, best_score = key, score
+
+        best_score = float(best_score) / qnorm
+        if best_key is None or best_score < threshold:
+            return None, best_score
+        return best_key, best_score
+
+    def _score_matrix(self, query):
+        nrows, ncols = self.matrix.shape
+        cols = np.array([col for col in query if col < ncols], dtype=np.int64)
+        if cols.size == 0:
+            return None, 0.0
+        qw = np.array([query[col] for col in cols], dtype=np.float32)
+
+        # Pick candidates on the rarer n-grams only, then score them exactly
+        common = self.df[cols] > FUZZY_COMMON_DF * nrows
+        if (~common).sum() < FUZZY_MIN_RARE:
+            common[np.argsort(self.df[cols])[:FUZZY_MIN_RARE]] = False
+        indptr, indices, data = self.matrix.indptr, self.matrix.indices, self.matrix.data
+        partial = np.zeros(nrows, dtype=np.float32)
+        for col, w in zip(cols[~common], qw[~common]):
+            start, end = indptr[col], indptr[col + 1]
+            partial[indices[start:end]] += data[start:end] * w
+        partial[~self.alive] = 0.0
+        touched = np.flatnonzero(partial)
+        if touched.size == 0:
+            return None, 0.0
+        k = min(FUZZY_CANDIDATES, touched.size)
+        candidates = touched[np.argpartition(partial[touched], -k)[-k:]]
+
+        # Exact cosine for the candidates from their raw counts
+        qdense = np.zeros(ncols, dtype=np.float64)
+        qdense[cols] = qw
+        rows = self.tf[candidates]
+        weighted = rows.data * self.idf[rows.indices]
+        dots = np.add.reduceat(weighted * qdense[rows.indices], rows.indptr[:-1])
+        scores = dots / self.norms[candidates]
+
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            return None, 0.0
+        return self.keys[candidates[best]], float(scores[best])
+
+fuzzy_matcher = None
+
+def get_fuzzy_matcher():
+    """Build the fuzzy index on first use; mutations keep it current afterwards."""
+    global fuzzy_matcher
+    if fuzzy_matcher is None:
+        fuzzy_matcher = FuzzyMatcher()
+        fuzzy_matcher.add_many(question_index)
+        if compiled_kb is not None:
+            fuzzy_matcher.add_many(compiled_kb.keys())
+        fuzzy_matcher.merge()
+    return fuzzy_matcher
+
+def fuzzy_lookup(q, threshold=FUZZY_THRESHOLD):
+    """Return (matched key, answers) for the closest known question, or (None, None)."""
+    if not load_fuzzy_deps():
+        return None, None
+    key, _ = get_fuzzy_matcher().best_match(resolve_question(q), threshold)
+    if key is None:
+        return None, None
+    return key, lookup_answers(key)
+
+# ---------- Keyword index ----------
+
+KEYWORD_RESULTS = 10        # related questions offered for a keyword
+KEYWORD_MAX_TOKENS = 3      # longer inputs are treated as questions, not keywords
+KEYWORD_STOPWORDS = frozenset("""
+    a about am an and any are can could did do does for from have how i in is it me my
+    of on or should tell the there to was what when where which who why will with would you your
+""".split())
+
+KEYWORD_TOKEN = re.compile(r"[a-z0-9]+")
+keyword_stems = {}
+
+def keyword_stem(token):
+    """Crude suffix stripping, so "lecturing" and "lecture" both give "lectur"."""
+    stem = keyword_stems.get(token)
+    if stem is None:
+        stem = token
+        if len(token) > 4:
+            for suffix in ("ing", "ed", "es", "e", "s"):
+                if token.endswith(suffix):
+                    stem = token[:-len(suffix)]
+                    break
+        keyword_stems[token] = stem
+    return stem
+
+def keyword_tokens(text):
+    """Split normalized text into stemmed tokens."""
+    return [keyword_stem(token) for token in KEYWORD_TOKEN.findall(text)]
+
+class KeywordIndex:
+    """Inverted index from stemmed tokens to the canonical questions that contain them."""
+
+    def __init__(self):
+        self.postings = {}   # token -> set of normalized questions
+        self.tokens = {}     # normalized question -> its distinct tokens
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def add(self, key):
+        if not key or key in self.tokens:
+            return
+        tokens = set(keyword_tokens(key)) - KEYWORD_STOPWORDS
+        self.tokens[key] = tokens
+        postings = self.postings
+        for token in tokens:
+            if token in postings:
+                postings[token].add(key)
+            else:
+                postings[token] = {key}
+
+    def remove(self, key):
+        for token in self.tokens.pop(key, ()):
+            posting = self.postings[token]
+            posting.discard(key)
+            if not posting:
+                del self.postings[token]
+
+    def related(self, tokens, limit=KEYWORD_RESULTS):
+        """Rank questions sharing tokens: most tokens matched, then rarest, then shortest question."""
+        tokens = set(tokens)
+        rarest = min((self.postings.get(token, ()) for token in tokens), key=len)
+        # Questions containing every token outrank the rest and tie on score,
+        # so when there are enough of them the rarest posting list decides
+        full = rarest if len(tokens) == 1 else [key for key in rarest if tokens <= self.tokens[key]]
+        if len(full) >= limit:
+            return heapq.nsmallest(limit, full, key=lambda key: (len(key), key))
+        scores = {}
+        total = len(self.tokens) + 1
+        for token in tokens:
+            posting = self.postings.get(token, ())
+            weight = math.log(total / (len(posting) + 1)) + 1
+            for key in posting:
+                matched, score = scores.get(key, (0, 0.0))
+                scores[key] = (matched + 1, score + weight)
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1][0], -item[1][1], len(item[0]), item[0]))
+        return [key for key, _ in best]
+
+keyword_index = None
+
+def get_keyword_index():
+    """Build the keyword index on first use; mutations keep it current afterwards."""
+    global keyword_index
+    if keyword_index is None:
+        keyword_index = KeywordIndex()
+        for key in question_index:
+            keyword_index.add(key)
+        if compiled_kb is not None:
+            for key in compiled_kb.keys():
+                keyword_index.add(key)
+    return keyword_index
+
+def related_questions(text, limit=KEYWORD_RESULTS):
+    """Return questions related to a keyword input like 'python' or 'lecture hall'.
+
+    Returns [] for anything that reads like a question rather than a keyword.
+    """
+    words = KEYWORD_TOKEN.findall(normalize_question(text))
+    if not words or len(words) > KEYWORD_MAX_TOKENS or KEYWORD_STOPWORDS.intersection(words):
+        return []
+    return get_keyword_index().related(keyword_tokens(" ".join(words)), limit)
+
+# ---------- Prefix suggestions ----------
+
+SUGGEST_RESULTS = 10
+SUGGEST_INSORT_MAX = 64     # pending changes applied one by one; more trigger a re-sort
+
+class PrefixIndex:
+    """Sorted array of normalized questions and variants; a prefix query is one bisect.
+
+    Additions and removals queue up and are folded into the array on the
+    next query, by insort for a few or a single re-sort for many.
+    """
+
+    def __init__(self, keys=()):
+        self.members = set(keys)
+        self.keys = sorted(self.members)
+        self.pending = []
+        self.removed = set()
+
+    def __len__(self):
+        return len(self.members)
+
+    def add(self, key):
+        if key in self.removed:
+            self.removed.discard(key)
+            self.members.add(key)
+        elif key and key not in self.members:
+            self.members.add(key)
+            self.pending.append(key)
+
+    def remove(self, key):
+        if key in self.members:
+            self.members.discard(key)
+            self.removed.add(key)
+
+    def _flush(self):
+        if len(self.pending) + len(self.removed) <= SUGGEST_INSORT_MAX:
+            for key in self.removed:
+                i = bisect.bisect_left(self.keys, key)
+                if i < len(self.keys) and self.keys[i] == key:
+                    del self.keys[i]
+                else:
+                    self.pending.remove(key)
+            for key in self.pending:
+                bisect.insort(self.keys, key)
+        else:
+            self.keys.extend(self.pending)
+            self.keys.sort()
+            if self.removed:
+                self.keys = [key for key in self.keys if key not in self.removed]
+        self.pending = []
+        self.removed = set()
+
+    def suggest(self, prefix, limit=SUGGEST_RESULTS):
+        if self.pending or self.removed:
+            self._flush()
+        i = bisect.bisect_left(self.keys, prefix)
+        return [key for key in self.keys[i:i + limit] if key.startswith(prefix)]
+
+    def span(self, prefix):
+        """Return the (start, end) slice of keys that start with prefix."""
+        if self.pending or self.removed:
+            self._flush()
+        if not prefix:
+            return 0, len(self.keys)
+        return bisect.bisect_left(self.keys, prefix), bisect.bisect_left(self.keys, prefix + "\U0010ffff")
+
+    def page(self, prefix, offset, limit, descending=False):
+        """Return keys starting with prefix, in order, after skipping offset of them."""
+        start, end = self.span(prefix)
+        if descending:
+            end -= offset
+            return self.keys[max(start, end - limit):end][::-1] if end > start else []
+        return self.keys[start + offset:min(end, start + offset + limit)]
+
+    def scan(self, prefix="", descending=False):
+        """Yield the keys starting with prefix, in order, walking the array by index so
+        a caller that stops early pays only for what it read.
+
+        A key added or removed by another thread meanwhile may be missed or repeated.
+        """
+        start, end = self.span(prefix)
+        keys = self.keys
+        for i in (range(end - 1, start - 1, -1) if descending else range(start, end)):
+            if i >= len(keys):
+                break
+            yield keys[i]
+
+prefix_index = None
+
+def get_prefix_index():
+    """Build the prefix index on first use; mutations keep it current afterwards."""
+    global prefix_index
+    if prefix_index is None:
+        keys = itertools.chain(question_index, variant_index)
+        if compiled_kb is not None:
+            keys = itertools.chain(keys, compiled_kb.keys())
+        prefix_index = PrefixIndex(keys)
+    return prefix_index
+
+def suggest(prefix, limit=SUGGEST_RESULTS):
+    """Return up to limit known questions and variants starting with prefix, alphabetically."""
+    normalized = normalize_question(prefix)
+    if normalized and prefix[-1:].isspace():
+        normalized += " "
+    return get_prefix_index().suggest(normalized, limit)
+
+# ---------- Knowledge base queries ----------
+#
+# A paged view over the prefix index (questions and variants, sorted). Prefix
+# queries in index order are one bisect and a slice; substring and regex
+# queries walk the index in order and stop as soon as the page is full.
+
+QUERY_LIMIT = 50
+QUERY_MODES = ("prefix", "contains", "regex")
+QUERY_SORTS = ("question", "answers")
+
+def query_row(key):
+    """Describe an indexed question or variant as {"question", "canonical", "answers"}."""
+    canonical = resolve_key(key)
+    answers = answers_for_key(canonical)
+    if answers is None and compiled_kb is not None:
+        canonical, answers = compiled_kb.lookup(key)
+    return {"question": key, "canonical": canonical or key, "answers": answers or []}
+
+def answer_count(key):
+    ids = question_index.get(resolve_key(key))
+    if ids is None:
+        return len(query_row(key)["answers"])
+    return 1 if type(ids) is int else len(ids)
+
+def query_knowledge_base(pattern="", mode="prefix", sort="question", descending=False, offset=0, limit=QUERY_LIMIT):
+    """Yield one page of the questions and variants matching pattern, as query_row() dicts.
+
+    mode is "prefix" or "contains" (matched against the normalized text) or
+    "regex" (searched in it). sort="answers" orders by answer count, keeping
+    only the best offset + limit matches in a heap. Raises ValueError for bad
+    arguments and re.error for a bad regex.
+    """
+    if mode not in QUERY_MODES or sort not in QUERY_SORTS:
+        raise ValueError(f"mode must be one of {', '.join(QUERY_MODES)} and sort one of {', '.join(QUERY_SORTS)}")
+    if offset < 0 or limit < 0:
+        raise ValueError("offset and limit must not be negative")
+    index = get_prefix_index()
+    if mode == "regex":
+        search = re.compile(pattern).search
+        keys = (key for key in index.scan(descending=descending) if search(key))
+    else:
+        text = normalize_question(pattern)
+        if mode == "prefix":
+            if text and pattern[-1:].isspace():
+                text += " "
+            if sort == "question":
+                for key in index.page(text, offset, limit, descending):
+                    yield query_row(key)
+                return
+            keys = index.scan(text, descending)
+        else:
+            keys = (key for key in index.scan(descending=descending) if text in key)
+
+    if sort == "answers":
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        page = [key for _, key in pick(offset + limit, ((answer_count(key), key) for key in keys))][offset:]
+    else:
+        page = itertools.islice(keys, offset, offset + limit)
+    for key in page:
+        yield query_row(key)
+
+def run_query(args):
+    """Print a --query page, as text or JSON lines, as the rows come in."""
+    if args.limit < 1 or args.offset < 0:
+        print("❌ Error: --limit must be at least 1 and --offset at least 0.")
+        return
+    try:
+        rows = query_knowledge_base(args.query, args.match, args.sort, args.desc, args.offset, args.limit + 1)
+        shown = 0
+        for row in rows:
+            if shown == args.limit:
+                if not args.json:
+                    print(f"… more results: add --offset {args.offset + args.limit}")
+                break
+            shown += 1
+            if args.json:
+                print(json.dumps(row))
+            elif row["canonical"] != row["question"]:
+                print(f"{args.offset + shown}. '{row['question']}' → '{row['canonical']}'")
+            else:
+                print(f"{args.offset + shown}. {row['question']} ({len(row['answers'])} answer(s))")
+    except re.error as e:
+        print(f"❌ Error: Invalid regular expression: {e}")
+        return
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return
+    if not shown and not args.json:
+        print("No questions or variants match.")
+
+# ---------- Spelling correction ----------
+#
+# Symmetric delete spelling correction (SymSpell): every vocabulary word is
+# stored under each string reachable by deleting up to SPELL_MAX_DISTANCE
+# characters from its first SPELL_PREFIX characters. A typo generates its own
+# deletes, and any shared delete yields a candidate, so the work per token
+# does not depend on the vocabulary size.
+
+SPELL_MAX_DISTANCE = 2
+SPELL_PREFIX = 7
+SPELL_MIN_LENGTH = 3        # shorter tokens are left alone
+
+def spell_deletes(word, distance):
+    word = word[:SPELL_PREFIX]
+    deletes = {word}
+    frontier = deletes
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        deletes = deletes | frontier
+    return deletes
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (transpositions count as one edit), capped at limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class SpellIndex:
+    """Vocabulary of known question words plus their delete index."""
+
+    def __init__(self):
+        self.words = {}     # word -> number of indexed questions/variants using it (0 once all are gone)
+        self.deletes = {}   # delete -> words it was derived from
+        self.texts = set()
+
+    def add(self, text):
+        if not text or text in self.texts:
+            return
+        self.texts.add(text)
+        for word in set(KEYWORD_TOKEN.findall(text)):
+            count = self.words.get(word)
+            if count is None:
+                count = 0
+                if len(word) >= SPELL_MIN_LENGTH and word.isalpha():
+                    for delete in spell_deletes(word, SPELL_MAX_DISTANCE):
+                        self.deletes.setdefault(delete, []).append(word)
+            self.words[word] = count + 1
+
+    def remove(self, text):
+        if text in self.texts:
+            self.texts.discard(text)
+            for word in set(KEYWORD_TOKEN.findall(text)):
+                self.words[word] -= 1
+
+    def correct_word(self, word):
+        """Return the closest known word (fewest edits, then most used), or word itself."""
+        if self.words.get(word) or len(word) < SPELL_MIN_LENGTH or not word.isalpha():
+            return word
+        limit = 1 if len(word) <= 4 else SPELL_MAX_DISTANCE
+        best = None
+        seen = set()
+        for delete in spell_deletes(word, limit):
+            for candidate in self.deletes.get(delete, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                count = self.words[candidate]
+                if not count:
+                    continue
+                distance = edit_distance(word, candidate, limit)
+                if distance <= limit and (best is None or (distance, -count) < best[:2]):
+                    best = (distance, -count, candidate)
+        return word if best is None else best[2]
+
+    def correct(self, text):
+        """Correct every token of a normalized question."""
+        return " ".join(self.correct_word(word) for word in text.split())
+
+spell_index = None
+
+def get_spell_index():
+    """Build the spelling index on first use; mutations keep it current afterwards."""
+    global spell_index
+    if spell_index is None:
+        spell_index = SpellIndex()
+        for key in itertools.chain(question_index, variant_index):
+            spell_index.add(key)
+        if compiled_kb is not None:
+            for key in compiled_kb.keys():
+                spell_index.add(key)
+    return spell_index
+
+def spellcheck_lookup(q):
+    """Return (matched key, answers) for q after correcting its tokens, or (None, None)."""
+    nq = normalize_question(q)
+    corrected = get_spell_index().correct(nq)
+    if corrected == nq:
+        return None, None
+    return lookup_question(corrected)
+
 def add_question(q, a, args):
     
     q = normalize_question(q)
     new_answers = [a] if isinstance(a, str) else a
 
-    if q in stored_questions:
+    def merge():
+        if q not in stored_questions:
+            return {q: list(new_answers)}
         existing_answers = stored_questions[q]
+        seen = set(existing_answers)
         for ans in new_answers:
-            if ans not in existing_answers:
+            if ans not in seen:
+                seen.add(ans)
                 existing_answers.append(ans)
-        stored_questions[q] = existing_answers
-    else:
-        stored_questions[q] = new_answers
+        return {q: existing_answers}
 
-    save_questions()
+    update_questions(merge)
     print(f"Updated stored_questions: '{q}' → {stored_questions[q]}")
 
     # ✅ Add logging here
     if args.log:
-        logging.info(f"Added answer '{a}' to question '{q}'")
+        logging.info("Added answer '%s' to question '%s'", a, q)
+    return stored_questions[q]
 
 
 def remove_answer(question, answer, args):
     q = normalize_question(question)
-    if q in stored_questions:
-        if answer in stored_questions[q]:
-            stored_questions[q].remove(answer)
-            # If no answers left, remove the whole question
-            if not stored_questions[q]:
-                del stored_questions[q]
-            save_questions()
-            print(f"✅ Answer removed: '{answer}' from question: '{q}'")
-            if args.log:
-                logging.info(f"Removed answer '{answer}' from question '{q}'")
-        else:
-            print(f"Answer '{answer}' not found for question '{q}'.")
+
+    def drop_answer():
+        remaining = stored_questions.get(q)
+        if remaining is None or answer not in remaining:
+            return {}
+        remaining.remove(answer)
+        # If no answers left, remove the whole question
+        return {q: remaining or None}
+
+    if update_questions(drop_answer):
+        print(f"✅ Answer removed: '{answer}' from question: '{q}'")
+        if args.log:
+            logging.info("Removed answer '%s' from question '%s'", answer, q)
+        return True
+    elif q in stored_questions:
+        print(f"Answer '{answer}' not found for question '{q}'.")
     else:
         print(f"Question '{q}' not found.")
+    return False
 
 
 
 def remove_question(question, args):
     q = normalize_question(question)
-    if q in stored_questions:
-        del stored_questions[q]
-        save_questions()
+    if update_questions(lambda: {q: None} if q in stored_questions else {}):
         print(f"Removed question '{q}'.")
         if args.log:
-            logging.info(f"Removed entire question '{q}'")
+            logging.info("Removed entire question '%s'", q)
+        return True
     else:
         print(f"Question '{q}' not found.")
+    return False
 
 
 
-def checking_question(compound_question,args):
-    all_questions = get_all_questions()
+def split_compound_question(compound_question):
     compound_question = re.sub(r'^(hi|hello|hey)[, ]*', '', compound_question.strip(), flags=re.IGNORECASE)
     split_questions = re.split(r'\?\s*|\band\b|\bor\b', compound_question.lower())
-    matched_any = False
-
-    for q in split_questions:
-        q = q.strip()
-        if not q:
-            continue
-        nq = normalize_question(q)
-        canonical_q = question_variants.get(nq, nq)
-
-        matched_q = None
-        for question_key in all_questions:
-            if normalize_question(question_key) == canonical_q:
-                matched_q = question_key
-                break
-
-        if matched_q:
-            matched_any = True
-            answer = random.choice(all_questions[matched_q])
-            print(format_message("Bot", answer))
+    return [q.strip() for q in split_questions if q.strip()]
+
+def match_question(q, args):
+    """Return (matched key, answers) for a single sub-question, or (None, None)."""
+    key, answers = lookup_question(q)
+    if not answers and args.spellcheck:
+        timed = metrics.enabled
+        if timed:
+            start = time.perf_counter()
+        key, answers = spellcheck_lookup(q)
+        if timed:
+            metrics.lap("spellcheck", start)
+            if answers:
+                metrics.count("spelling_corrections")
+        if answers and args.log:
+            logging.info("Corrected '%s' to '%s'", q, key)
+    if not answers and args.fuzzy:
+        timed = metrics.enabled
+        if timed:
+            start = time.perf_counter()
+        key, answers = fuzzy_lookup(q, args.fuzzy_threshold)
+        if timed:
+            metrics.lap("fuzzy", start)
+            if answers:
+                metrics.count("fuzzy_matches")
+        if answers and args.log:
+            logging.info("Fuzzy matched '%s' to '%s'", q, key)
+    if not answers:
+        return None, None
+    return key, answers
+
+def answer_question(compound_question, args):
+    """Return a (question, matched key, answer) tuple for every answered sub-question."""
+    timed = metrics.enabled
+    if timed:
+        begin = start = time.perf_counter()
+    results = []
+    cache_key = (compound_question, args.fuzzy_threshold) if args.fuzzy else compound_question
+    resolved = answer_cache.get(cache_key)
+    if resolved is not None:
+        matches = [(q, key, answers_for_key(key) if key is not None else None) for q, key in resolved]
+        if timed:
+            start = metrics.lap("cache", start)
+    else:
+        matches = []
+        deps = set()
+        sub_questions = split_compound_question(compound_question)
+        if timed:
+            start = metrics.lap("split", start)
+        for q in sub_questions:
+            key, answers = match_question(q, args)
+            matches.append((q, key, answers))
+            nq = normalize_question(q)
+            exact = resolve_key(nq)
+            deps.update((nq, exact))
+            if (args.fuzzy or args.spellcheck) and key != exact:
+                deps.add(None)
+        answer_cache.put(cache_key, [(q, key) for q, key, _ in matches], deps)
+    for q, key, answers in matches:
+        if timed:
+            start = time.perf_counter()
+            metrics.count("questions_matched" if answers else "questions_unrecognized")
+        if answers:
+            answer = random.choice(answers)
+            if timed:
+                start = metrics.lap("choice", start)
+            results.append((q, key, answer))
             if args.log:
-                logging.info(f"User asked: '{q}' → Bot answered: '{answer}'")
+                logging.info("User asked: '%s' → Bot answered: '%s'", q, answer)
+                if timed:
+                    start = metrics.lap("log", start)
+
+    if not results and args.log:
+        logging.warning("Unrecognized question: '%s'", compound_question)
+    if timed:
+        metrics.observe("answer", time.perf_counter() - begin)
+        metrics.count("requests")
+    return results
 
-    if not matched_any:
+def checking_question(compound_question,args):
+    results = answer_question(compound_question, args)
+    for _, _, answer in results:
+        print(format_message("Bot", answer))
+    if not results:
         print(format_message("Bot", "I have no answer for your question(s)!"))
-        if args.log:
-            logging.warning(f"Unrecognized question: '{compound_question}'")
 
 
 
-def print_trivia_question(qidx):
+def trivia_question_lines(qidx):
     q = trivia_questions[qidx]
-    print(format_message("Bot", f"\nQ: {q['question']}"))
+    lines = [f"\nQ: {q['question']}"]
     for key in sorted(q["choices"].keys()):
-        print(f"   {key}. {q['choices'][key]}")
-    print(format_message("Bot", "Type A, B, C, or D as your answer:"))
-
-def interactive(args):
-    print(format_message("Bot", "Hello! Ask me anything or type a keyword like 'python'. Type 'bye' to exit."))
-
-    state = "idle"
-    current_keyword = None
-    related_list = []
-
-    # --- Trivia variables ---
-    intriviamode = False
-    trivia_score = 0
-    trivia_current = 0
-    trivia_indices = []
-
-    while True:
-        stop_event = threading.Event()
-        temp_thread = threading.Thread(target=scroll_temperature_forever, args=(stop_event,), daemon=True)
-        temp_thread.start()
-        user_input = input("You: ").strip().lower()
-        stop_event.set()
-        temp_thread.join()
-        if SENSE_HAT_AVAILABLE:
-         sense.clear()
-
-        if user_input == "bye":
-            print(format_message("Bot", "Goodbye!"))
-            break
-
-   
-
-        # == TRIVIA GAME HANDLING ==
-        if user_input == "trivia":
-            if not intriviamode:
-                # Start new trivia game
-                intriviamode = True
-                trivia_score = 0
-                trivia_current = 0
-                trivia_indices = random.sample(range(len(trivia_questions)), min(10, len(trivia_questions)))
-                print(format_message("Bot", "🎲 Trivia game activated! Answer the following questions. Type 'score' any time to see your score, or 'trivia' again to stop the game and see your final results."))
-                # Ask the first question immediately!
-                qidx = trivia_indices[trivia_current]
-                print_trivia_question(qidx)
-                continue
-            else:
-                # End trivia, show score, go back to chat
-                print(format_message("Bot", f"🏁 Trivia game ended! Your final score: {trivia_score} out of {trivia_current}."))
-                intriviamode = False
-                continue
-
-        if intriviamode:
-            if user_input == "score":
-                print(format_message("Bot", f"⭐ Your current score: {trivia_score} out of {trivia_current} attempted."))
-                show_score(trivia_score, trivia_current)
-                # re-ask the current question (don't increment, repeat same)
-                qidx = trivia_indices[trivia_current]
-                print_trivia_question(qidx)
-                continue
-
-            # Process user's answer to the current question
-            qidx = trivia_indices[trivia_current]
-            question_info = trivia_questions[qidx]
-            correct_answer = question_info["answer"].strip().upper()
-            user_answer = user_input.strip().upper()
-
-            trivia_current += 1  # Increment attempted count
-
-            if user_answer == correct_answer:
-                trivia_score += 1
-                print(format_message("Bot", "✅ Correct!"))
+        lines.append(f"   {key}. {q['choices'][key]}")
+    lines.append("Type A, B, C, or D as your answer:")
+    return lines
+
+# ---------- Sessions ----------
+
+SESSION_IDLE = 0
+SESSION_SELECTING = 1
+SESSION_CLOSED = 2
+SESSION_MAX = 100000           # sessions kept before the least recently used is evicted
+SESSION_IDLE_TIMEOUT = 1800    # seconds without input before a session is evicted
+GREETING = "Hello! Ask me anything or type a keyword like 'python'. Type '?what is' for suggestions or 'bye' to exit."
+
+class Session:
+    """State of one conversation, kept small so a process can hold many of them.
+
+    related is a tuple of existing question keys and trivia an array of
+    question indices (None outside a trivia game).
+    """
+
+    __slots__ = ("id", "mode", "keyword", "related", "trivia", "trivia_score", "trivia_current", "last_seen")
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.mode = SESSION_IDLE
+        self.keyword = None
+        self.related = ()
+        self.trivia = None
+        self.trivia_score = 0
+        self.trivia_current = 0
+        self.last_seen = time.monotonic()
+
+def handle(session, text, args, display=False):
+    """Advance a conversation by one user input and return the bot's replies.
+
+    Replies that start with spaces are listing lines (choices, suggestions)
+    belonging to the message before them. With display, trivia feedback is
+    also shown on the Sense HAT.
+    """
+    user_input = text.strip().lower()
+    session.last_seen = time.monotonic()
+
+    if user_input == "bye":
+        session.mode = SESSION_CLOSED
+        return ["Goodbye!"]
+
+    # Questions added by other chatbot processes show up without a restart
+    refresh_questions(args)
+    intriviamode = session.trivia is not None
+
+    if user_input == "temperature" and not intriviamode:
+        sampler = get_sampler()
+        if sampler is None:
+            return ["I don't have a temperature sensor."]
+        replies = [f"It's {sampler.latest():.1f}C right now (recent average {sampler.smoothed():.1f}C)."]
+        replies.extend(f"   {line}" for line in format_temperature_history(sampler.history(10)))
+        return replies
+
+    if user_input.startswith("?") and not intriviamode:
+        prefix = user_input[1:]
+        suggestions = suggest(prefix)
+        if not suggestions:
+            return [f"I don't know any questions starting with '{prefix}'."]
+        return [f"Questions starting with '{prefix}':"] + [f"   {q}" for q in suggestions]
+
+    # == TRIVIA GAME HANDLING ==
+    if user_input == "trivia":
+        if not intriviamode:
+            # Start new trivia game
+            session.trivia = array('H', random.sample(range(len(trivia_questions)), min(10, len(trivia_questions))))
+            session.trivia_score = 0
+            session.trivia_current = 0
+            # Ask the first question immediately!
+            return (["🎲 Trivia game activated! Answer the following questions. Type 'score' any time to see your score, or 'trivia' again to stop the game and see your final results."]
+                    + trivia_question_lines(session.trivia[0]))
+        # End trivia, show score, go back to chat
+        session.trivia = None
+        return [f"🏁 Trivia game ended! Your final score: {session.trivia_score} out of {session.trivia_current}."]
+
+    if intriviamode:
+        if user_input == "score":
+            if display:
+                show_score(session.trivia_score, session.trivia_current)
+            # re-ask the current question (don't increment, repeat same)
+            return ([f"⭐ Your current score: {session.trivia_score} out of {session.trivia_current} attempted."]
+                    + trivia_question_lines(session.trivia[session.trivia_current]))
+
+        # Process user's answer to the current question
+        question_info = trivia_questions[session.trivia[session.trivia_current]]
+        correct_answer = question_info["answer"].strip().upper()
+        session.trivia_current += 1  # Increment attempted count
+
+        if user_input.upper() == correct_answer:
+            session.trivia_score += 1
+            replies = ["✅ Correct!"]
+            if display:
                 show_right()
-            else:
-                print(format_message("Bot", f"❌ Incorrect. The correct answer was: {correct_answer} - {question_info['choices'][correct_answer]}"))
+        else:
+            replies = [f"❌ Incorrect. The correct answer was: {correct_answer} - {question_info['choices'][correct_answer]}"]
+            if display:
                 show_wrong()
 
-            # Next question, or finish the game
-            if trivia_current >= len(trivia_indices):
-                print(format_message("Bot", f"🏁 Trivia complete! Your final score: {trivia_score} out of {trivia_current}."))
-                intriviamode = False
-            else:
-                qidx = trivia_indices[trivia_current]
-                print_trivia_question(qidx)
-            continue
+        # Next question, or finish the game
+        if session.trivia_current >= len(session.trivia):
+            replies.append(f"🏁 Trivia complete! Your final score: {session.trivia_score} out of {session.trivia_current}.")
+            session.trivia = None
+        else:
+            replies.extend(trivia_question_lines(session.trivia[session.trivia_current]))
+        return replies
+
+    if session.mode == SESSION_SELECTING and session.keyword:
+        if not user_input.isdigit():
+            return ["Please enter a valid number."]
+        choice = int(user_input) - 1
+        if not 0 <= choice < len(session.related):
+            return ["Invalid number. Please try again."]
+        selected_question = session.related[choice]
+        answers = lookup_answers(selected_question)
+        session.mode = SESSION_IDLE
+        session.keyword = None
+        session.related = ()
+        if answers:
+            return [f"You selected: {selected_question}", random.choice(answers)]
+        return ["Sorry, I don't have an answer for that."]
+
+    related = [] if lookup_answers(user_input) else related_questions(user_input)
+    if related:
+        session.mode = SESSION_SELECTING
+        session.keyword = user_input
+        session.related = tuple(related)
+        return ([f"Here are related questions about '{user_input}':"]
+                + [f"   {idx}. {q}" for idx, q in enumerate(related, 1)]
+                + ["Please enter the number of the question you're interested in."])
+
+    results = answer_question(user_input, args)
+    if not results:
+        return ["I have no answer for your question(s)!"]
+    return [answer for _, _, answer in results]
+
+def print_replies(replies):
+    for reply in replies:
+        print(reply if reply.startswith("   ") else format_message("Bot", reply))
+
+class SessionManager:
+    """Sessions by id, least recently used first.
+
+    Sessions idle for longer than idle_timeout, or beyond max_sessions, are
+    evicted on the next request, so memory stays bounded.
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = OrderedDict()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def get(self, session_id=None):
+        """Return the session for session_id, starting a new one if it is unknown, expired or missing."""
+        session = self.sessions.get(session_id) if session_id else None
+        if session is not None:
+            if session.last_seen >= time.monotonic() - self.idle_timeout:
+                # Touch it first, so making room never evicts the session being asked for
+                self.sessions.move_to_end(session_id)
+                self.evict(self.max_sessions)
+                return session
+            del self.sessions[session_id]
+            self.evicted += 1
+        self.evict(self.max_sessions - 1)
+        if not session_id:
+            import secrets
+            session_id = secrets.token_urlsafe(12)
+        session = self.sessions[session_id] = Session(session_id)
+        return session
+
+    def handle(self, session_id, text, args):
+        """Feed text to a session; returns (session, replies). Closed sessions are dropped."""
+        session = self.get(session_id)
+        replies = handle(session, text, args)
+        if session.mode == SESSION_CLOSED:
+            del self.sessions[session.id]
+        return session, replies
+
+    def evict(self, keep):
+        """Drop idle sessions, and the least recently used ones beyond keep."""
+        deadline = time.monotonic() - self.idle_timeout
+        sessions = self.sessions
+        while sessions:
+            session = next(iter(sessions.values()))
+            if session.last_seen >= deadline and len(sessions) <= keep:
+                break
+            del sessions[session.id]
+            self.evicted += 1
 
-        # ========== (existing code below) ==========
-        if state == "awaiting_selection" and current_keyword:
-            if user_input.isdigit():
-                choice = int(user_input) - 1
-                if 0 <= choice < len(related_list):
-                    selected_question = related_list[choice]
-                    normalized_q = normalize_question(selected_question)
-                    canonical_q = question_variants.get(normalized_q, normalized_q)
-                    all_questions = get_all_questions()
-
-                    matched_q = None
-                    for question_key in all_questions:
-                        if normalize_question(question_key) == canonical_q:
-                            matched_q = question_key
-                            break
-
-                    if matched_q:
-                        answer = random.choice(all_questions[matched_q])
-                        print(format_message("Bot", f"You selected: {selected_question}"))
-                        print(format_message("Bot", answer))
-                    else:
-                        print(format_message("Bot", "Sorry, I don't have an answer for that."))
-                    state = "idle"
-                    current_keyword = None
-                    related_list = []
-                else:
-                    print(format_message("Bot", "Invalid number. Please try again."))
-            else:
-                print(format_message("Bot", "Please enter a valid number."))
-            continue
+sessions = SessionManager()
 
-        if user_input in keyword_map:
-            related_list = keyword_map[user_input]
-            current_keyword = user_input
-            state = "awaiting_selection"
-            print(format_message("Bot", f"Here are related questions about '{user_input}':"))
-            for idx, q in enumerate(related_list, 1):
-                print(f"{idx}. {q}")
-            print(format_message("Bot", "Please enter the number of the question you're interested in."))
+def interactive(args):
+    print(format_message("Bot", GREETING))
+
+    get_sampler(args.sample_interval)
+    display = get_display()
+    session = Session("local")
+
+    while session.mode != SESSION_CLOSED:
+        display.start_ticker()
+        user_input = input("You: ")
+        if metrics.enabled:
+            start = time.perf_counter()
+            display.stop_ticker()
+            metrics.lap("display", start)
         else:
-            checking_question(user_input, args)
+            display.stop_ticker()
+
+        print_replies(handle(session, user_input, args, display=True))
 
 def list_questions(all_q):
     print("\n--- Canonical Questions ---")
@@ -536,118 +2709,1215 @@ def list_question_variants(variant_dict):
     for variant, canonical in variant_dict.items():
         print(f"'{variant}' → '{canonical}'")
 
-def import_questions_from_file(filepath, filetype, args):
+IMPORT_CHUNK_ROWS = 50000
+IMPORT_REPORT_LIMIT = 20        # questions listed per kind of change after an upsert
+
+class ImportRun:
+    """Stores an import chunk by chunk; every row replaces what is stored.
+
+    With pending (a pair of dicts), changes are collected there instead of
+    written, so several files can be stored in one update_questions() call.
+    """
+
+    def __init__(self, pending=None):
+        self.count = 0
+        self.pending = pending
+
+    def write(self, changes, variants):
+        if self.pending is None:
+            # Imported rows replace whatever is stored, so there is nothing to recompute on a conflict
+            update_questions(lambda: changes, variants)
+        else:
+            self.pending[0].update(changes)
+            self.pending[1].update(variants)
+
+    def add(self, imported, variants):
+        variants = {variant: canonical for variant, canonical in variants.items() if variant_index.get(variant) != canonical}
+        self.write(imported, variants)
+        self.count += len(imported)
+
+    def finish(self):
+        """Called once every row has been added."""
+
+    def report(self, filepath, args):
+        print(f"✅ Import successful. {self.count} question(s) imported from '{filepath}'.")
+        if args.log:
+            logging.info("Imported %s question(s) from '%s'.", self.count, filepath)
+        return self.count
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def row_hash(answers, variants):
+    data = "\x1e".join(answers) + "\x1d" + "\x1e".join(variants)
+    return int.from_bytes(hashlib.blake2b(data.encode(), digest_size=8).digest(), "big")
+
+def load_import_manifest():
+    """Return {absolute file path: {"checksum", "rows", "variants"}} for files imported with --upsert."""
     try:
-        # 1. Check if file exists
-        if not os.path.exists(filepath):
-            print(f"❌ Error: The file path '{filepath}' does not exist.")
-            if args.log:
-                logging.warning(f"File path does not exist: '{filepath}'")
-            return
+        with open(IMPORT_MANIFEST_FILE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_import_manifest(entries):
+    with store.locked():
+        manifest = load_import_manifest()
+        manifest.update(entries)
+        tmp_path = IMPORT_MANIFEST_FILE + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, IMPORT_MANIFEST_FILE)
+
+class UpsertRun(ImportRun):
+    """Applies only the rows that were added, changed or deleted since the file was last upserted.
+
+    Each row (a question with its answers and variants) is hashed and compared
+    with the hash recorded in IMPORT_MANIFEST_FILE; rows that are gone from
+    the file are deleted along with their variants.
+    """
+
+    def __init__(self, source, checksum, entry, pending=None):
+        super().__init__(pending)
+        self.source = source
+        self.checksum = checksum
+        self.old_rows = entry.get("rows", {})
+        self.old_variants = entry.get("variants", {})
+        self.rows = {}
+        self.variants = {}
+        self.added = []
+        self.changed = []
+        self.deleted = []
+        self.unchanged = 0
+
+    def add(self, imported, variants):
+        by_question = {}
+        for variant, canonical in variants.items():
+            by_question.setdefault(canonical, []).append(variant)
+        changes = {}
+        variant_changes = {}
+        for q in itertools.chain(imported, (q for q in by_question if q not in imported)):
+            answers = imported.get(q, [])
+            row_variants = sorted(by_question.get(q, ()))
+            digest = row_hash(answers, row_variants)
+            self.rows[q] = digest
+            if row_variants:
+                self.variants[q] = row_variants
+            if self.old_rows.get(q) == digest:
+                self.unchanged += 1
+                continue
 
-        # 2. Check for read permissions
-        if not os.access(filepath, os.R_OK):
-            print(f"❌ Error: Access denied. Please check file permissions for '{filepath}'.")
-            if args.log:
-                logging.warning(f"Access denied for file: '{filepath}'")
-            return
+            stored = stored_questions.get(q)
+            changed = False
+            if answers:
+                if stored != answers:
+                    changes[q] = answers
+                    changed = True
+            elif q in self.old_rows and stored is not None:
+                # The row lost its answers
+                changes[q] = None
+                changed = True
+            for variant in self.old_variants.get(q, ()):
+                if variant not in row_variants and stored_variants.get(variant) == q:
+                    variant_changes.setdefault(variant, None)
+                    changed = True
+            for variant in row_variants:
+                if variant_index.get(variant) != q:
+                    variant_changes[variant] = q
+                    changed = True
+
+            if not changed:
+                self.unchanged += 1
+            elif stored is None and q not in self.old_rows:
+                self.added.append(q)
+            else:
+                self.changed.append(q)
+        if changes or variant_changes:
+            self.write(changes, variant_changes)
+        self.count += len(imported)
+
+    def manifest_entry(self):
+        return {"checksum": self.checksum, "rows": self.rows, "variants": self.variants}
+
+    def finish(self):
+        changes = {}
+        variant_changes = {}
+        for q in self.old_rows:
+            if q in self.rows:
+                continue
+            self.deleted.append(q)
+            if q in stored_questions:
+                changes[q] = None
+            for variant in self.old_variants.get(q, ()):
+                if stored_variants.get(variant) == q:
+                    variant_changes[variant] = None
+        if changes or variant_changes:
+            self.write(changes, variant_changes)
+
+    def report(self, filepath, args):
+        if self.pending is None:
+            save_import_manifest({self.source: self.manifest_entry()})
+        print(f"✅ Upsert of '{filepath}' done: {len(self.added)} added, {len(self.changed)} changed, "
+              f"{len(self.deleted)} deleted, {self.unchanged} unchanged.")
+        for sign, keys in (("+", self.added), ("~", self.changed), ("-", self.deleted)):
+            for q in keys[:IMPORT_REPORT_LIMIT]:
+                print(f"   {sign} {q}")
+            if len(keys) > IMPORT_REPORT_LIMIT:
+                print(f"   {sign} ... and {len(keys) - IMPORT_REPORT_LIMIT} more")
+        if args.log:
+            logging.info("Upserted '%s': %s added, %s changed, %s deleted, %s unchanged.", filepath,
+                         len(self.added), len(self.changed), len(self.deleted), self.unchanged)
+            for sign, keys in (("added", self.added), ("changed", self.changed), ("deleted", self.deleted)):
+                for q in keys:
+                    logging.info("Upsert %s '%s'", sign, q)
+        return len(self.added) + len(self.changed) + len(self.deleted)
+
+
+def read_import_chunks(pd, filepath, filetype):
+    """Yield the file as DataFrames of at most IMPORT_CHUNK_ROWS rows, every sheet of a workbook in turn."""
+    if filetype.upper() == "CSV":
+        yield from pd.read_csv(filepath, chunksize=IMPORT_CHUNK_ROWS)
+        return
+    if filepath.lower().endswith(".xls"):
+        # openpyxl can't stream legacy .xls; these files are small enough to read whole
+        yield from pd.read_excel(filepath, sheet_name=None).values()
+        return
+
+    from openpyxl import load_workbook
 
-        # 3. Check file extension
-        if filetype.upper() == "CSV" and not filepath.lower().endswith(".csv"):
-            print("❌ Error: File type mismatch. Expected a .csv file.")
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = ["" if name is None else str(name) for name in header]
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= IMPORT_CHUNK_ROWS:
+                    yield pd.DataFrame(batch, columns=header)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+def import_columns(df):
+    """Return (normalized column names, answer columns) of an import chunk; raises ValueError if it has none to import."""
+    columns = [] if df is None else [str(name).strip().lower() for name in df.columns]
+    if 'question' not in columns:
+        raise ValueError("Missing required column 'question'.")
+    answer_cols = [col for col in columns if col.startswith('answer')]
+    if not answer_cols:
+        raise ValueError("No 'answer' columns found.")
+    return columns, answer_cols
+
+def normalize_question_series(series):
+    """Vectorized normalize_question over a pandas Series; missing cells become ""."""
+    # astype(str) keeps NaN under pandas 3, and None from openpyxl becomes NaN too
+    return (series.fillna("").astype(str).str.lower().str.strip()
+            .str.replace(r'[?.!]', '', regex=True)
+            .str.replace(r'\s+', ' ', regex=True))
+
+def read_question_chunk(df, answer_cols):
+    """Return one chunk of an import as ({question: answers}, {variant: canonical question})."""
+    base_questions = normalize_question_series(df['question']).tolist()
+    # Row-major boolean mask picks each row's present answers in column order
+    present = df[answer_cols].notna().to_numpy()
+    stripped = df[answer_cols].astype(str).apply(lambda col: col.str.strip()).to_numpy(dtype=object)
+    flat_answers = stripped[present].tolist()
+    ends = present.sum(axis=1).cumsum().tolist()
+
+    imported = {}
+    imported_rows = []
+    start = 0
+    for row, end in enumerate(ends):
+        # Rows with a blank question cell are skipped
+        if end > start and base_questions[row]:
+            imported[base_questions[row]] = flat_answers[start:end]
+            imported_rows.append(row)
+        start = end
+
+    # Process variations if available
+    variants = {}
+    if 'variations' in df.columns:
+        variations = df['variations'].iloc[imported_rows].dropna()
+        variations = variations.astype(str).str.strip().str.split(';').explode()
+        for row, var in zip(variations.index, normalize_question_series(variations)):
+            if var:
+                variants[var] = base_questions[df.index.get_loc(row)]
+
+    return imported, variants
+
+def import_filetype(path):
+    """Return the --filetype a path's extension implies, or None."""
+    if path.lower().endswith(".csv"):
+        return "CSV"
+    if path.lower().endswith((".xlsx", ".xls")):
+        return "XLSX"
+    return columnar_filetype(path)
+
+def check_import_file(filepath, filetype, args):
+    """Return filepath's upper-case file type, or None (after saying why) if it can't be imported."""
+    # 1. Check if file exists
+    if not os.path.exists(filepath):
+        print(f"❌ Error: The file path '{filepath}' does not exist.")
+        if args.log:
+            logging.warning("File path does not exist: '%s'", filepath)
+        return None
+
+    # 2. Check for read permissions
+    if not os.access(filepath, os.R_OK):
+        print(f"❌ Error: Access denied. Please check file permissions for '{filepath}'.")
+        if args.log:
+            logging.warning("Access denied for file: '%s'", filepath)
+        return None
+
+    # 3. Check file extension
+    if not filetype:
+        filetype = import_filetype(filepath)
+        if filetype is None:
+            print(f"❌ Error: Can't tell the type of '{filepath}' from its extension; pass --filetype.")
             if args.log:
-                logging.warning("File type mismatch: expected .csv")
+                logging.warning("Unknown import file type: '%s'", filepath)
+            return None
+    filetype = filetype.upper()
+    if filetype == "CSV" and not filepath.lower().endswith(".csv"):
+        print("❌ Error: File type mismatch. Expected a .csv file.")
+        if args.log:
+            logging.warning("File type mismatch: expected .csv")
+        return None
+    if filetype == "XLSX" and not filepath.lower().endswith((".xlsx", ".xls")):
+        print("❌ Error: File type mismatch. Expected an Excel file (.xlsx or .xls).")
+        if args.log:
+            logging.warning("File type mismatch: expected .xlsx or .xls")
+        return None
+    if filetype in COLUMNAR_EXTENSIONS:
+        if columnar_filetype(filepath) != filetype:
+            expected = " or ".join(COLUMNAR_EXTENSIONS[filetype])
+            print(f"❌ Error: File type mismatch. Expected a {expected} file.")
+            if args.log:
+                logging.warning("File type mismatch: expected %s", expected)
+            return None
+    return filetype
+
+def start_import_run(filepath, args, upsert, manifest=None, pending=None):
+    """Return the ImportRun that will store filepath, or None if --upsert finds the file unchanged."""
+    if not upsert:
+        return ImportRun(pending)
+    source = os.path.abspath(filepath)
+    checksum = file_checksum(filepath)
+    entry = (load_import_manifest() if manifest is None else manifest).get(source, {})
+    if entry.get("checksum") == checksum:
+        print(f"⏭️ '{filepath}' has not changed since it was last imported; nothing to do.")
+        if args.log:
+            logging.info("Skipped unchanged import file '%s'.", filepath)
+        return None
+    return UpsertRun(source, checksum, entry, pending)
+
+def import_questions_from_file(filepath, filetype, args, upsert=False):
+    run = None
+    try:
+        filetype = check_import_file(filepath, filetype, args)
+        if filetype is None:
             return
-        if filetype.upper() == "XLSX" and not filepath.lower().endswith((".xlsx", ".xls")):
-            print("❌ Error: File type mismatch. Expected an Excel file (.xlsx or .xls).")
+
+        run = start_import_run(filepath, args, upsert)
+        if run is None:
+            return 0
+        if filetype in COLUMNAR_EXTENSIONS:
+            return import_columnar_file(filepath, filetype, args, run)
+
+        try:
+            import pandas as pd
+        except ImportError:
+            print("❌ Error: Importing questions requires pandas (pip install pandas).")
             if args.log:
-                logging.warning("File type mismatch: expected .xlsx or .xls")
+                logging.warning("pandas is not installed; import aborted.")
             return
 
-        # 4. Try reading the file
-        if filetype.upper() == "CSV":
+        # 4. Try reading the file (first chunk; the rest stream in below)
+        chunks = read_import_chunks(pd, filepath, filetype)
+        if filetype == "CSV":
             try:
-                df = pd.read_csv(filepath)
+                df = next(chunks, None)
             except Exception as e:
                 print(f"❌ Error reading CSV: {e}")
                 if args.log:
-                    logging.warning(f"Failed to read CSV: {e}")
+                    logging.warning("Failed to read CSV: %s", e)
                 return
         else:
             try:
-                df = pd.read_excel(filepath)
+                df = next(chunks, None)
             except Exception as e:
                 print(f"❌ Error reading Excel file: {e}")
                 if args.log:
-                    logging.warning(f"Failed to read Excel file: {e}")
+                    logging.warning("Failed to read Excel file: %s", e)
                 return
 
-        # 5. Normalize columns
-        df.columns = df.columns.str.strip().str.lower()
-
-        if 'question' not in df.columns:
-            print("❌ Error: Missing required column 'question'.")
+        # 5-6. Normalize columns and process rows chunk by chunk, sheet by sheet.
+        # A sheet without the needed columns is skipped; the import only fails if every sheet is.
+        rows_read = 0
+        skipped = []
+        error = None if df is not None else "Missing required column 'question'."
+        while df is not None:
+            try:
+                columns, answer_cols = import_columns(df)
+            except ValueError as e:
+                error = e
+                skipped.append((len(df), e))
+            else:
+                df.columns = columns
+                rows_read += len(df)
+                run.add(*read_question_chunk(df, answer_cols))
+                if rows_read >= IMPORT_CHUNK_ROWS:
+                    print(f"⏳ {rows_read} row(s) read, {run.count} question(s) imported so far...")
+            df = next(chunks, None)
+
+        if not rows_read and error is not None:
+            print(f"❌ Error: {error}")
             if args.log:
-                logging.warning("Missing 'question' column in file.")
+                logging.warning("Cannot import '%s': %s", filepath, error)
             return
-
-        answer_cols = [col for col in df.columns if col.startswith('answer')]
-        if not answer_cols:
-            print("❌ Error: No 'answer' columns found.")
+        for count, e in skipped:
+            print(f"⚠️ Skipped {count} row(s) of '{filepath}': {e}")
             if args.log:
-                logging.warning("No 'answer' columns found in file.")
-            return
+                logging.warning("Skipped %s row(s) of '%s': %s", count, filepath, e)
 
-        # 6. Process rows
-        imported_count = 0
-        for _, row in df.iterrows():
-            base_q = normalize_question(str(row['question']))
-            answers = [str(row[col]).strip() for col in answer_cols if pd.notna(row[col])]
-            if answers:
-                stored_questions[base_q] = answers
-                imported_count += 1
-
-                # Process variations if available
-                if 'variations' in df.columns and pd.notna(row['variations']):
-                    for var in str(row['variations']).strip().split(';'):
-                        var = normalize_question(var)
-                        question_variants[var] = base_q
-
-        save_questions()
-        print(f"✅ Import successful. {imported_count} question(s) imported.")
-        if args.log:
-            logging.info(f"Imported {imported_count} question(s) from '{filepath}'.")
+        run.finish()
+        return run.report(filepath, args)
 
     
     except Exception as e:
         print(f"❌ Unexpected error during import: {e}")
         if args.log:
-            logging.warning(f"Unexpected error during import: {e}")
+            logging.warning("Unexpected error during import: %s", e)
+        if run is not None and run.count:
+            # Chunks are stored as they are read, so the ones before the error are kept
+            print(f"⚠️ {run.count} question(s) read before the error were already stored; "
+                  "fix the file and import it again.")
+            if args.log:
+                logging.warning("Import of '%s' stopped after storing %s question(s).", filepath, run.count)
 
 
     
 
 ...
 
+def expand_import_sources(patterns, filetype=None):
+    """Return the files patterns name, in a stable order.
+
+    A pattern is a file, a glob (recursive with **) or a directory; globs and
+    directories only pick up files of an importable type (of filetype, if given).
+    """
+    import glob
+
+    def wanted(path):
+        name = os.path.basename(path)
+        found_type = import_filetype(path)
+        # Skip hidden files and Excel's ~$ lock files
+        return (found_type is not None and not name.startswith((".", "~$"))
+                and (not filetype or found_type == filetype.upper()))
+
+    sources = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                sources.extend(os.path.join(root, name) for name in sorted(files) if wanted(name))
+        elif any(ch in pattern for ch in "*?["):
+            sources.extend(path for path in sorted(glob.glob(pattern, recursive=True))
+                           if os.path.isfile(path) and wanted(path))
+        else:
+            sources.append(pattern)
+    return list(dict.fromkeys(sources))
+
+def read_import_file(filepath, filetype):
+    """Parse a whole import file, every sheet included; runs in the import worker processes.
+
+    Returns ({question: answers}, {variant: canonical question}, rows read,
+    sheets or chunks skipped for lacking the needed columns). Later rows win,
+    as they would in a sequential import.
+    """
+    imported = {}
+    variants = {}
+    rows = 0
+    skipped = 0
+    if filetype in COLUMNAR_EXTENSIONS:
+        for batch in read_columnar_batches(filepath, filetype):
+            names = [name.strip().lower() for name in batch.schema.names]
+            if 'question' not in names or 'answers' not in names:
+                raise ValueError("Columnar files need a 'question' column and an 'answers' list column.")
+            batch_questions, batch_variants = read_columnar_batch(batch)
+            imported.update(batch_questions)
+            variants.update(batch_variants)
+            rows += batch.num_rows
+    else:
+        import pandas as pd
+
+        for df in read_import_chunks(pd, filepath, filetype):
+            try:
+                columns, answer_cols = import_columns(df)
+            except ValueError:
+                skipped += 1
+                continue
+            df.columns = columns
+            chunk_questions, chunk_variants = read_question_chunk(df, answer_cols)
+            imported.update(chunk_questions)
+            variants.update(chunk_variants)
+            rows += len(df)
+        if skipped and not rows:
+            raise ValueError("No sheet has a 'question' column and 'answer' columns.")
+    return imported, variants, rows, skipped
+
+def read_import_files(files, workers):
+    """Yield read_import_file()'s result, or the exception it raised, for each (path, filetype) in order."""
+    if workers <= 1:
+        for path, filetype in files:
+            try:
+                yield read_import_file(path, filetype)
+            except Exception as e:
+                yield e
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method)) as pool:
+        futures = [pool.submit(read_import_file, path, filetype) for path, filetype in files]
+        # Results are merged in file order, whichever worker finishes first
+        for future in futures:
+            try:
+                yield future.result()
+            except Exception as e:
+                yield e
+
+def import_questions_from_sources(patterns, filetype, args, upsert=False):
+    """Import every file patterns name (see expand_import_sources).
+
+    Files are parsed in parallel by up to --workers processes (default: one
+    per CPU), merged in file order so later files win, and stored with a
+    single update_questions() call. Returns the number of questions imported
+    (added, changed or deleted with upsert), or None if nothing could be read.
+    """
+    sources = expand_import_sources(patterns, filetype)
+    if not sources:
+        print(f"❌ Error: No importable files match {', '.join(patterns)}.")
+        if args.log:
+            logging.warning("No import files match %s", patterns)
+        return
+    if len(sources) == 1:
+        return import_questions_from_file(sources[0], filetype, args, upsert)
+
+    start = time.perf_counter()
+    manifest = load_import_manifest() if upsert else None
+    pending = ({}, {})
+    jobs = []
+    skipped = 0
+    for path in sources:
+        path_type = check_import_file(path, filetype, args)
+        if path_type is None:
+            continue
+        run = start_import_run(path, args, upsert, manifest, pending)
+        if run is None:
+            skipped += 1
+            continue
+        jobs.append((path, path_type, run))
+    if not jobs:
+        return 0 if skipped else None
+
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(jobs)))
+    print(f"⏳ Reading {len(jobs)} file(s) with {workers} worker process(es)...")
+    done = []
+    results = read_import_files([(path, path_type) for path, path_type, _ in jobs], workers)
+    for (path, _, run), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            print(f"❌ Error reading '{path}': {result}")
+            if args.log:
+                logging.warning("Failed to read '%s': %s", path, result)
+            continue
+        imported, variants, rows, skipped_parts = result
+        if skipped_parts:
+            print(f"⚠️ Skipped {skipped_parts} sheet(s) or chunk(s) of '{path}' without 'question' and 'answer' columns.")
+        run.add(imported, variants)
+        run.finish()
+        done.append((path, run))
+
+    # One persistence step for every file
+    update_questions(lambda: pending[0], pending[1])
+    if upsert:
+        save_import_manifest({run.source: run.manifest_entry() for _, run in done})
+    count = sum(run.report(path, args) for path, run in done)
+    print(f"✅ {len(done)} of {len(sources)} file(s) imported in {time.perf_counter() - start:.1f} s.")
+    if args.log:
+        logging.info("Imported %s of %s file(s) (%s question(s)).", len(done), len(sources), count)
+    return count if done else None
+
+# ---------- Columnar (Parquet / Arrow IPC) import and export ----------
+#
+# One row per canonical question: question (string), answers (list<string>),
+# variations (list<string>, optional).
+
+COLUMNAR_EXTENSIONS = {"PARQUET": (".parquet",), "ARROW": (".arrow", ".feather", ".ipc")}
+
+def columnar_filetype(path):
+    """Return "PARQUET" or "ARROW" for a path with a columnar extension, else None."""
+    for filetype, extensions in COLUMNAR_EXTENSIONS.items():
+        if path.lower().endswith(extensions):
+            return filetype
+    return None
+
+def normalize_question_array(pc, array):
+    """Vectorized normalize_question over an Arrow string array."""
+    array = pc.utf8_trim_whitespace(pc.utf8_lower(array))
+    array = pc.replace_substring_regex(array, r"[?.!]", "")
+    return pc.replace_substring_regex(array, r"\s+", " ")
+
+def read_columnar_batches(filepath, filetype):
+    """Yield the file as Arrow record batches of at most IMPORT_CHUNK_ROWS rows."""
+    import pyarrow as pa
+
+    if filetype == "PARQUET":
+        import pyarrow.parquet as pq
+
+        yield from pq.ParquetFile(filepath).iter_batches(batch_size=IMPORT_CHUNK_ROWS)
+        return
+    with pa.memory_map(filepath) as source:
+        try:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            source.seek(0)
+            batches = pa.ipc.open_stream(source)
+        for batch in batches:
+            yield from (batch.slice(start, IMPORT_CHUNK_ROWS) for start in range(0, batch.num_rows, IMPORT_CHUNK_ROWS))
+
+def read_columnar_batch(batch):
+    """Return one record batch as ({question: answers}, {variant: canonical question})."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = {name.strip().lower(): batch.column(i) for i, name in enumerate(batch.schema.names)}
+    base_questions = normalize_question_array(pc, columns["question"].cast(pa.string()))
+    answers = columns["answers"]
+    # Strip every answer in one pass and drop empty ones before going back to Python.
+    # Offsets are rebuilt from the lengths because a sliced batch's offsets don't start
+    # at zero, which from_arrays rejects together with a null mask.
+    values = pc.utf8_trim_whitespace(pc.list_flatten(answers).cast(pa.string()))
+    lengths = pc.fill_null(pc.list_value_length(answers), 0).cast(pa.int32())
+    offsets = pa.concat_arrays([pa.array([0], type=pa.int32()), pc.cumulative_sum(lengths)])
+    answers = pa.ListArray.from_arrays(offsets, values, mask=answers.is_null())
+    keep = pc.and_(pc.is_valid(base_questions), pc.fill_null(pc.greater(pc.list_value_length(answers), 0), False))
+    imported_questions = base_questions.filter(keep).to_pylist()
+    imported_answers = answers.filter(keep).to_pylist()
+    if values.null_count or pc.any(pc.equal(values, "")).as_py():
+        imported_answers = [[a for a in row if a] for row in imported_answers]
+    imported = {q: a for q, a in zip(imported_questions, imported_answers) if q and a}
+
+    variants = {}
+    if "variations" in columns:
+        variations = columns["variations"]
+        rows = pc.list_parent_indices(variations)
+        flat = normalize_question_array(pc, pc.list_flatten(variations).cast(pa.string()))
+        canonicals = base_questions.take(rows).to_pylist()
+        for var, canonical in zip(flat.to_pylist(), canonicals):
+            if var and canonical:
+                variants[var] = canonical
+
+    return imported, variants
+
+def import_columnar_file(filepath, filetype, args, run):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print(f"❌ Error: Importing {filetype} files requires pyarrow (pip install pyarrow).")
+        if args.log:
+            logging.warning("pyarrow is not installed; import aborted.")
+        return
+
+    batches = read_columnar_batches(filepath, filetype)
+    try:
+        batch = next(batches, None)
+    except Exception as e:
+        print(f"❌ Error reading {filetype} file: {e}")
+        if args.log:
+            logging.warning("Failed to read %s file: %s", filetype, e)
+        return
+
+    columns = [] if batch is None else [name.strip().lower() for name in batch.schema.names]
+    if 'question' not in columns or 'answers' not in columns:
+        print("❌ Error: Columnar files need a 'question' column and an 'answers' list column.")
+        if args.log:
+            logging.warning("Missing 'question' or 'answers' column in file.")
+        return
+
+    rows_read = 0
+    while batch is not None:
+        rows_read += batch.num_rows
+        run.add(*read_columnar_batch(batch))
+        if rows_read >= IMPORT_CHUNK_ROWS:
+            print(f"⏳ {rows_read} row(s) read, {run.count} question(s) imported so far...")
+        batch = next(batches, None)
+
+    run.finish()
+    return run.report(filepath, args)
+
+def export_columnar(path, filetype):
+    """Write stored_questions and their variants to a Parquet or Arrow IPC file; returns the row count."""
+    import pyarrow as pa
+
+    variations = {}
+    for variant, canonical in variant_index.items():
+        variations.setdefault(canonical, []).append(variant)
+    keys = list(stored_questions)
+    # Variants of questions that are not stored get rows without answers, so they survive a round trip
+    keys.extend(canonical for canonical in variations if canonical not in stored_questions)
+    table = pa.table({
+        "question": pa.array(keys, type=pa.string()),
+        "answers": pa.array([stored_questions.get(key, []) for key in keys], type=pa.list_(pa.string())),
+        "variations": pa.array([variations.get(key, []) for key in keys], type=pa.list_(pa.string())),
+    })
+
+    tmp_path = path + ".tmp"
+    if filetype == "PARQUET":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, tmp_path, row_group_size=IMPORT_CHUNK_ROWS * 4)
+    else:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=IMPORT_CHUNK_ROWS)
+    os.replace(tmp_path, path)
+    return table.num_rows
+
+# ---------- Batch mode ----------
+
+BATCH_CHUNK = 1000
+
+def answer_batch_chunk(chunk, args):
+    """Answer (line number, text) pairs; returns (JSON lines, answered count)."""
+    refresh_questions(args)
+    lines = []
+    answered = 0
+    for line_no, text in chunk:
+        for q in split_compound_question(text) or [text.strip()]:
+            key, answers = match_question(q, args)
+            if answers:
+                answered += 1
+            record = {
+                "line": line_no,
+                "question": q,
+                "key": key,
+                "answer": random.choice(answers) if answers else None,
+            }
+            lines.append(json.dumps(record, ensure_ascii=False))
+    return lines, answered
+
+def _batch_worker_init(kb=None):
+    # Forked workers already hold the parent's knowledge base; spawned ones open the same one
+    if compiled_kb is None and not question_index:
+        if kb:
+            attach_compiled_kb(kb)
+        else:
+            load_questions()
+    random.seed()
+
+def read_batch_chunks(stream):
+    chunk = []
+    for line_no, text in enumerate(stream, 1):
+        if text.strip():
+            chunk.append((line_no, text))
+        if len(chunk) >= BATCH_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def answer_batch_chunks(chunks, args):
+    """Yield answer_batch_chunk results in input order, fanning out to a process pool if asked."""
+    workers = args.workers or 1
+    if workers <= 1:
+        for chunk in chunks:
+            yield answer_batch_chunk(chunk, args)
+        return
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    # Forked workers inherit the loaded knowledge base instead of re-reading it
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method),
+                             initializer=_batch_worker_init, initargs=(args.kb,)) as pool:
+        # Only a bounded window of chunks is in flight, so memory stays flat on huge inputs
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(answer_batch_chunk, chunk, args))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def run_batch(source, output, args):
+    """Stream questions from source (a path or '-') and write JSONL answers to output."""
+    import sys
+
+    if source != "-":
+        if not os.path.exists(source):
+            print(f"❌ Error: The file path '{source}' does not exist.", file=sys.stderr)
+            if args.log:
+                logging.warning("File path does not exist: '%s'", source)
+            return
+        if not os.access(source, os.R_OK):
+            print(f"❌ Error: Access denied. Please check file permissions for '{source}'.", file=sys.stderr)
+            if args.log:
+                logging.warning("Access denied for file: '%s'", source)
+            return
+    in_stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        out_stream = sys.stdout if not output or output == "-" else open(output, "w", encoding="utf-8")
+    except OSError as e:
+        if in_stream is not sys.stdin:
+            in_stream.close()
+        print(f"❌ Error: Could not write batch output to '{output}': {e}", file=sys.stderr)
+        return
+    answered = total = 0
+    try:
+        for lines, chunk_answered in answer_batch_chunks(read_batch_chunks(in_stream), args):
+            out_stream.write("\n".join(lines) + "\n")
+            total += len(lines)
+            answered += chunk_answered
+    finally:
+        if in_stream is not sys.stdin:
+            in_stream.close()
+        if out_stream is not sys.stdout:
+            out_stream.close()
+        else:
+            out_stream.flush()
+
+    print(f"✅ Batch complete. {answered} of {total} question(s) answered.", file=sys.stderr)
+    if args.log:
+        logging.info("Batch answered %s of %s question(s) from '%s'.", answered, total, source)
+
+# ---------- Server mode ----------
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
+def handle_request(method, target, body, args):
+    """Route one HTTP request to the chatbot; returns (status line, JSON payload)."""
+    from urllib.parse import urlsplit, parse_qs
+
+    refresh_questions(args)
+    url = urlsplit(target)
+    params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    if body:
+        try:
+            params.update(json.loads(body))
+        except (ValueError, TypeError):
+            return "400 Bad Request", {"error": "Body must be a JSON object."}
+    for name in ("question", "q", "answer", "text"):
+        if params.get(name) is not None and not isinstance(params[name], str):
+            return "400 Bad Request", {"error": f"'{name}' must be a string."}
+
+    if url.path == "/ask":
+        question = params.get("question") or params.get("q")
+        if not question:
+            return "400 Bad Request", {"error": "Missing 'question'."}
+        results = answer_question(question, args)
+        return "200 OK", {"answers": [{"question": q, "key": key, "answer": answer} for q, key, answer in results]}
+
+    if method != "POST" and url.path in ("/add", "/remove", "/import"):
+        return "405 Method Not Allowed", {"error": f"Use POST for {url.path}."}
+
+    if compiled_kb is not None and url.path in ("/add", "/remove", "/import"):
+        return "403 Forbidden", {"error": "--kb is read-only; change questions without it and run --compile again."}
+
+    if url.path == "/add":
+        if not params.get("question") or not params.get("answer"):
+            return "400 Bad Request", {"error": "/add requires 'question' and 'answer'."}
+        answers = add_question(params["question"], params["answer"], args)
+        return "200 OK", {"ok": True, "answers": answers}
+
+    if url.path == "/remove":
+        if not params.get("question"):
+            return "400 Bad Request", {"error": "/remove requires 'question'."}
+        if params.get("answer"):
+            ok = remove_answer(params["question"], params["answer"], args)
+        else:
+            ok = remove_question(params["question"], args)
+        return "200 OK", {"ok": ok}
+
+    if url.path == "/import":
+        if not params.get("filepath"):
+            return "400 Bad Request", {"error": "/import requires 'filepath' (one path or glob, or a list of them)."}
+        patterns = params["filepath"] if isinstance(params["filepath"], list) else [params["filepath"]]
+        imported = import_questions_from_sources(patterns, params.get("filetype"), args,
+                                                 upsert=bool(params.get("upsert")))
+        return "200 OK", {"ok": imported is not None, "imported": imported or 0}
+
+    if url.path == "/chat":
+        text = params.get("text")
+        if text is None:
+            return "400 Bad Request", {"error": "/chat requires 'text'."}
+        session, replies = sessions.handle(params.get("session"), text, args)
+        return "200 OK", {"session": session.id, "replies": replies, "closed": session.mode == SESSION_CLOSED}
+
+    if url.path == "/suggest":
+        prefix = params.get("prefix", "")
+        try:
+            limit = int(params.get("limit", SUGGEST_RESULTS))
+            if limit < 1:
+                raise ValueError("limit must be at least 1")
+            if not isinstance(prefix, str):
+                raise TypeError("prefix must be a string")
+        except (TypeError, ValueError) as e:
+            return "400 Bad Request", {"error": f"Bad /suggest parameter: {e}"}
+        return "200 OK", {"suggestions": suggest(prefix, limit)}
+
+    if url.path == "/query":
+        try:
+            offset = int(params.get("offset", 0))
+            limit = int(params.get("limit", QUERY_LIMIT))
+            if limit < 1 or offset < 0:
+                raise ValueError("limit must be at least 1 and offset at least 0")
+            rows = list(query_knowledge_base(params.get("q", ""), params.get("match", "prefix"),
+                                             params.get("sort", "question"), params.get("desc") in ("1", "true", True),
+                                             offset, limit + 1))
+        except (TypeError, ValueError, re.error) as e:
+            return "400 Bad Request", {"error": f"Bad /query parameter: {e}"}
+        more = len(rows) > limit
+        return "200 OK", {"results": rows[:limit], "next_offset": offset + limit if more else None}
+
+    if url.path == "/temperature":
+        sampler = get_sampler()
+        if sampler is None:
+            return "404 Not Found", {"error": "No temperature sensor."}
+        try:
+            n = int(params.get("n", TEMP_HISTORY_SIZE))
+            if n < 0:
+                raise ValueError("n must be at least 0")
+        except (TypeError, ValueError) as e:
+            return "400 Bad Request", {"error": f"Bad /temperature parameter: {e}"}
+        readings = sampler.history(n)
+        return "200 OK", {"latest": sampler.latest(), "smoothed": sampler.smoothed(),
+                          "history": [{"time": ts, "celsius": value} for ts, value in readings]}
+
+    if url.path == "/metrics":
+        return "200 OK", metrics.prometheus()
+
+    if url.path == "/health":
+        return "200 OK", {"ok": True, "questions": len(stored_questions)}
+
+    return "404 Not Found", {"error": f"Unknown path '{url.path}'."}
+
+async def serve_connection(reader, writer, args):
+    """Answer HTTP/1.1 requests on one connection, keeping it alive between requests."""
+    import asyncio
+
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, version = request_line.decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            body = await reader.readexactly(length) if length else b""
+
+            try:
+                status, payload = handle_request(method, target, body, args)
+            except Exception as e:
+                if args.log:
+                    logging.exception("Request %s %s failed.", method, target)
+                status, payload = "500 Internal Server Error", {"error": f"{type(e).__name__}: {e}"}
+            if isinstance(payload, str):
+                data = payload.encode()
+                content_type = "text/plain; version=0.0.4"
+            else:
+                data = json.dumps(payload).encode()
+                content_type = "application/json"
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+def serve(args):
+    """Keep the knowledge base loaded and answer over HTTP on TCP or a Unix socket."""
+    import asyncio
+
+    get_sampler(args.sample_interval)
+    sessions.max_sessions = args.max_sessions
+    sessions.idle_timeout = args.session_timeout
+
+    async def run():
+        def handler(reader, writer):
+            return serve_connection(reader, writer, args)
+
+        if args.socket:
+            server = await asyncio.start_unix_server(handler, path=args.socket)
+            where = f"unix:{args.socket}"
+        else:
+            server = await asyncio.start_server(handler, args.host, args.port)
+            where = f"http://{args.host}:{args.port}"
+        print(f"✅ Serving {len(stored_questions)} question(s) on {where}. Press Ctrl+C to stop.")
+        if args.log:
+            logging.info("Server listening on %s", where)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Server stopped.")
+    finally:
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+def server_request(url, method, path, payload=None):
+    """Send one request to a running --serve instance and return its JSON reply."""
+    import http.client
+    import socket
+    from urllib.parse import urlsplit
+
+    class UnixHTTPConnection(http.client.HTTPConnection):
+        def __init__(self, socket_path):
+            super().__init__("localhost")
+            self.socket_path = socket_path
+
+        def connect(self):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(self.socket_path)
+
+    parts = urlsplit(url)
+    if parts.scheme == "unix":
+        conn = UnixHTTPConnection(parts.path)
+    else:
+        conn = http.client.HTTPConnection(parts.hostname or SERVER_HOST, parts.port or SERVER_PORT)
+    try:
+        body = json.dumps(payload) if payload is not None else None
+        conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+def run_client(args):
+    """Forward a one-shot CLI command to the server at --connect."""
+    try:
+        if args.add:
+            if not (args.question and args.answer):
+                print("❌ Error: --add requires both --question and --answer")
+                return
+            reply = server_request(args.connect, "POST", "/add", {"question": args.question, "answer": args.answer})
+            if reply.get("ok"):
+                print(f"Updated stored_questions: '{normalize_question(args.question)}' → {reply['answers']}")
+        elif args.remove:
+            if not args.question:
+                print("❌ Error: --remove requires at least --question")
+                return
+            payload = {"question": args.question}
+            if args.answer:
+                payload["answer"] = args.answer
+            reply = server_request(args.connect, "POST", "/remove", payload)
+            if reply.get("ok"):
+                print(f"✅ Removed from question '{normalize_question(args.question)}'.")
+            else:
+                print("Nothing matching was found to remove.")
+        elif args.import_questions and args.filepath:
+            payload = {"filepath": [os.path.abspath(path) for path in args.filepath], "filetype": args.filetype,
+                       "upsert": args.upsert}
+            reply = server_request(args.connect, "POST", "/import", payload)
+            if reply.get("ok") and args.upsert:
+                print(f"✅ Upsert successful. {reply['imported']} question(s) added, changed or deleted.")
+            elif reply.get("ok"):
+                print(f"✅ Import successful. {reply['imported']} question(s) imported.")
+            else:
+                print("❌ Import failed; see the server output for details.")
+        elif args.question:
+            reply = server_request(args.connect, "POST", "/ask", {"question": args.question})
+            for result in reply.get("answers", []):
+                print(format_message("Bot", result["answer"]))
+            if not reply.get("answers"):
+                print(format_message("Bot", "I have no answer for your question(s)!"))
+        else:
+            print("❌ Error: --connect works with --question, --add, --remove or --import_questions")
+            return
+        if "error" in reply:
+            print(f"❌ Server error: {reply['error']}")
+    except OSError as e:
+        print(f"❌ Could not reach the chatbot server at '{args.connect}': {e}")
+
+
+# ---------- Logging ----------
+
+LOG_FILE = "chatbot.log"
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+LOG_BATCH_SIZE = 256     # records written between flushes at most
+
+def gzip_rotator(source, dest):
+    import gzip
+    import shutil
+
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+def make_log_handler(args):
+    """Build the chatbot.log handler; rotated files are gzipped."""
+    import logging.handlers
+
+    if args.log_rotate == "size":
+        base = logging.handlers.RotatingFileHandler
+        options = {"maxBytes": args.log_max_bytes, "backupCount": args.log_backups}
+    elif args.log_rotate == "time":
+        base = logging.handlers.TimedRotatingFileHandler
+        options = {"when": args.log_when, "backupCount": args.log_backups}
+    else:
+        base = logging.FileHandler
+        options = {}
+
+    class BatchedFileHandler(base):
+        """Skips the per-record flush; LogWriter flushes once per batch."""
+
+        def flush(self):
+            pass
+
+        def flush_batch(self):
+            self.acquire()
+            try:
+                if self.stream:
+                    self.stream.flush()
+            finally:
+                self.release()
+
+    handler = BatchedFileHandler(LOG_FILE, encoding="utf-8", **options)
+    if args.log_rotate != "none":
+        handler.namer = lambda name: name + ".gz"
+        handler.rotator = gzip_rotator
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+class LogWriter:
+    """Background thread that drains queued log records into a file handler in batches."""
+
+    def __init__(self, log_queue, handler):
+        self.queue = log_queue
+        self.handler = handler
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is None:
+                    self.handler.flush_batch()
+                    return
+                self.handler.handle(record)
+            self.handler.flush_batch()
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.handler.close()
+
+def setup_logging(args):
+    """Route logging through a queue so callers never wait on disk; formatting happens on the writer thread."""
+    import logging.handlers
+
+    class LazyQueueHandler(logging.handlers.QueueHandler):
+        def prepare(self, record):
+            # Hand the record over untouched; LogWriter formats it
+            return record
+
+    log_level = logging.WARNING  # default
+    if args.loglevel == "INFO":
+        log_level = logging.INFO
+
+    log_queue = queue.SimpleQueue()
+    writer = LogWriter(log_queue, make_log_handler(args))
+    root = logging.getLogger()
+    root.setLevel(log_level)
+    root.addHandler(LazyQueueHandler(log_queue))
+    atexit.register(writer.stop)
+    return writer
+
+def enable_stats():
+    """Turn on metrics collection and print a summary when the process exits."""
+    import sys
+
+    metrics.enabled = True
+    metrics.gauge("knowledge_base_questions", lambda: len(question_index) + (len(compiled_kb) if compiled_kb else 0))
+    metrics.gauge("question_variants", lambda: len(variant_index))
+    metrics.gauge("unique_answers", lambda: len(stored_questions.pool))
+    metrics.gauge("fuzzy_index_questions", lambda: len(fuzzy_matcher) if fuzzy_matcher is not None else 0)
+    metrics.gauge("answer_cache_entries", lambda: len(answer_cache))
+    metrics.gauge("answer_cache_hits", lambda: answer_cache.hits)
+    metrics.gauge("answer_cache_misses", lambda: answer_cache.misses)
+    metrics.gauge("sessions", lambda: len(sessions))
+    metrics.gauge("sessions_evicted", lambda: sessions.evicted)
+    atexit.register(lambda: print(metrics.summary(), file=sys.stderr))
+
 def main():
     global stored_questions
     args = parse_args()
-    load_questions()
+    answer_cache.size = args.cache_size
+    if args.stats:
+        enable_stats()
+    if args.simulate_sense_hat:
+        use_simulated_sense_hat()
+    if args.connect:
+        run_client(args)
+        return
+    if args.kb:
+        if args.add or args.remove or args.import_questions or args.export or args.compact or args.compile or args.memory:
+            print("❌ Error: --kb is read-only; change questions without it and run --compile again.")
+            return
+        try:
+            attach_compiled_kb(args.kb)
+        except (OSError, ValueError) as e:
+            print(f"❌ Error: Could not open compiled knowledge base '{args.kb}': {e}")
+            return
+    else:
+        load_questions()
 
     # ✅ Setup logging if enabled
     if args.log:
-        log_level = logging.WARNING  # default
-        if args.loglevel == "INFO":
-            log_level = logging.INFO
-
-        logging.basicConfig(
-            filename="chatbot.log",
-            level=log_level,
-            format="%(asctime)s [%(levelname)s] %(message)s",
-            filemode="a"  # append mode
-        )
+        setup_logging(args)
         logging.info("🔄 Chatbot started in logging mode.")
 
+    if args.fuzzy and not load_fuzzy_deps():
+        print("⚠️ Fuzzy matching needs numpy and scipy; only exact matches will be answered.")
+
     entered_command = False
 
     if args.add:                                 
@@ -666,19 +3936,75 @@ def main():
         else:
             print("❌ Error: --remove requires at least --question")
 
+    elif args.query is not None:
+        entered_command = True
+        run_query(args)
+
     elif args.list_questions:                        
         entered_command = True
         list_questions(get_all_questions())
         list_question_variants(question_variants)
 
-    elif args.import_questions and args.filetype and args.filepath:     
+    elif args.export:
         entered_command = True
-        import_questions_from_file(args.filepath, args.filetype, args)
+        path = args.filepath[0] if args.filepath else QUESTION_FILE
+        filetype = args.filetype if args.filetype in COLUMNAR_EXTENSIONS else columnar_filetype(path)
+        if filetype and columnar_filetype(path) != filetype:
+            expected = " or ".join(COLUMNAR_EXTENSIONS[filetype])
+            print(f"❌ Error: File type mismatch. Expected a {expected} file.")
+        elif not filetype and not path.lower().endswith(".json"):
+            print("❌ Error: File type mismatch. Expected a .json, .parquet or .arrow file.")
+        elif filetype:
+            try:
+                rows = export_columnar(path, filetype)
+            except ImportError:
+                print(f"❌ Error: Exporting {filetype} files requires pyarrow (pip install pyarrow).")
+            else:
+                print(f"✅ Exported {rows} question(s) with their variants to '{path}'.")
+        else:
+            save_questions(path)
+            print(f"✅ Exported {len(stored_questions)} question(s) to '{path}'.")
+
+    elif args.compile:
+        entered_command = True
+        count = compile_knowledge_base(args.compile)
+        print(f"✅ Compiled {count} question(s) and variant(s) into '{args.compile}'.")
+
+    elif args.memory:
+        entered_command = True
+        print_memory_usage(stored_questions.memory_usage())
+
+    elif args.compact:
+        entered_command = True
+        sync_questions()
+        if store.compact(stored_questions, stored_variants, wait=True):
+            print(f"✅ Knowledge base compacted into '{SNAPSHOT_FILE}'.")
+        else:
+            print("⚠️ Another process is writing to or compacting the knowledge base; try again.")
+
+    elif args.import_questions and args.filepath:
+        entered_command = True
+        import_questions_from_sources(args.filepath, args.filetype, args, upsert=args.upsert)
 
     elif args.question and not args.add and not args.remove:            
         entered_command = True
         checking_question(args.question, args)
 
+    elif args.temperature_history is not None:
+        entered_command = True
+        if 1 <= args.temperature_history <= TEMP_HISTORY_SIZE:
+            print_temperature_history(args.temperature_history, args.sample_interval)
+        else:
+            print(f"❌ Error: --temperature-history must be between 1 and {TEMP_HISTORY_SIZE}.")
+
+    elif args.batch:
+        entered_command = True
+        run_batch(args.batch, args.output, args)
+
+    elif args.serve:
+        entered_command = True
+        serve(args)
+
     if not entered_command:
         interactive(args)
 